@@ -1,8 +1,131 @@
-
+import argparse
+import hashlib
+import json
+import mmap
+import multiprocessing
 import os
+import pickle
+import struct
 import sys
+import tempfile
 import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import compress
+from operator import itemgetter
 from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+WORDLIST_CACHE_FORMAT_VERSION = 3
+WORDLIST_CACHE_SUFFIX = ".cache"
+# offset of the pickled offsets of the lengths, at the end of the cache file
+WORDLIST_CACHE_TRAILER = struct.Struct("<Q")
+
+BINARY_WORDLIST_MAGIC = b"KRWL"
+BINARY_WORDLIST_FORMAT_VERSION = 1
+BINARY_WORDLIST_SUFFIX = ".bin"
+WORDLIST_STORE_TRIE = "trie"
+SESSION_FORMAT_VERSION = 1
+SESSION_SUFFIX = ".session.json"
+# magic, format version, bytes per letter, length of the alphabet in bytes
+BINARY_WORDLIST_HEADER = struct.Struct("<4sHBxI")
+# word length, number of words, offset of the first word
+BINARY_WORDLIST_TABLE_ENTRY = struct.Struct("<IIQ")
+
+
+class StatsTimer:
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.start_time = None
+
+    def __enter__(self):
+        if self.stats.enabled:
+            self.start_time = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.start_time is not None:
+            self.stats.add_time(self.name, time.perf_counter_ns() - self.start_time)
+            self.start_time = None
+
+
+class Stats:
+    # counters and timers of the solving steps, hot paths check stats.enabled before counting anything
+
+    def __init__(self):
+        self.enabled = False
+        self.counters = dict()
+        self.timers = dict()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        self.counters = dict()
+        self.timers = dict()
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name, elapsed_time):
+        calls, total_time = self.timers.get(name, (0, 0))
+        self.timers[name] = (calls + 1, total_time + elapsed_time)
+
+    def timer(self, name):
+        return StatsTimer(self, name)
+
+    def add(self, stats_dict):
+        # stats_dict as given by get_dict, e.g. from another process
+        for name, count in stats_dict["counters"].items():
+            self.count(name, count)
+        for name, timer in stats_dict["timers"].items():
+            calls, total_time = self.timers.get(name, (0, 0))
+            self.timers[name] = (calls + timer["calls"], total_time + timer["total_ns"])
+
+    def get_dict(self):
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "timers": {name: {"calls": calls, "total_ns": total_time} for name, (calls, total_time) in sorted(self.timers.items())}
+        }
+
+    def get_table(self):
+        name_width = max([len(name) for name in [*self.counters.keys(), *self.timers.keys()]] + [len("timer")])
+        lines = [f"{add_whitespace('timer', name_width)}  {'calls':>10}  {'total ms':>12}  {'mean us':>12}"]
+        for name, (calls, total_time) in sorted(self.timers.items()):
+            lines.append(f"{add_whitespace(name, name_width)}  {calls:>10}  {total_time / 1_000_000:>12.3f}  {total_time / calls / 1000:>12.3f}")
+        lines.append("")
+        lines.append(f"{add_whitespace('counter', name_width)}  {'count':>10}")
+        for name, count in sorted(self.counters.items()):
+            lines.append(f"{add_whitespace(name, name_width)}  {count:>10}")
+        return lines
+
+    def print_table(self, file=None):
+        for line in self.get_table():
+            print(line, file=file)
+
+
+stats = Stats()
+
+
+def timed(name):
+    # times the whole function with stats.timer, stats is looked up at call time
+    def decorator(function):
+        @wraps(function)
+        def timed_function(*args, **kwargs):
+            with stats.timer(name):
+                return function(*args, **kwargs)
+        return timed_function
+    return decorator
 
 
 def read_config(config_path):
@@ -50,16 +173,340 @@ def get_language_dict(language_file_path):
     return language_dict
 
 
-def get_wordlist(wordlist_path):
+class MappedWordBucket:
+    # words of one length, decoded from the memory map only when accessed
+
+    def __init__(self, buffer, offset, num_of_words, word_length, decoding_table):
+        self.buffer = buffer
+        self.offset = offset
+        self.num_of_words = num_of_words
+        self.word_length = word_length
+        self.decoding_table = decoding_table
+
+    def __len__(self):
+        return self.num_of_words
+
+    def __getitem__(self, word_id):
+        if isinstance(word_id, slice):
+            return [self[i] for i in range(*word_id.indices(self.num_of_words))]
+        if word_id < 0:
+            word_id += self.num_of_words
+        if not 0 <= word_id < self.num_of_words:
+            raise IndexError("word id out of range")
+        start = self.offset + word_id * self.word_length
+        return self.buffer[start:start + self.word_length].decode("latin-1").translate(self.decoding_table)
+
+    def __iter__(self):
+        for word_id in range(self.num_of_words):
+            yield self[word_id]
+
+
+class MappedWordlist:
+
+    def __init__(self, binary_path):
+        with open(binary_path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, code_width, alphabet_size = BINARY_WORDLIST_HEADER.unpack_from(self.buffer, 0)
+        if magic != BINARY_WORDLIST_MAGIC or version != BINARY_WORDLIST_FORMAT_VERSION or code_width != 1:
+            self.buffer.close()
+            raise ValueError(f"{binary_path} is not a supported binary wordlist")
+        position = BINARY_WORDLIST_HEADER.size
+        self.alphabet = self.buffer[position:position + alphabet_size].decode("utf-8")
+        position += alphabet_size
+        decoding_table = {code: char for code, char in enumerate(self.alphabet)}
+        num_of_lengths, = struct.unpack_from("<I", self.buffer, position)
+        position += 4
+        self.wordlists = dict()
+        for _ in range(num_of_lengths):
+            word_length, num_of_words, offset = BINARY_WORDLIST_TABLE_ENTRY.unpack_from(self.buffer, position)
+            position += BINARY_WORDLIST_TABLE_ENTRY.size
+            self.wordlists[word_length] = MappedWordBucket(self.buffer, offset, num_of_words, word_length, decoding_table)
+
+    def __len__(self):
+        return sum(len(words) for words in self.wordlists.values())
+
+    def __iter__(self):
+        for words in self.wordlists.values():
+            yield from words
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def is_binary_wordlist(wordlist_path):
+    with open(wordlist_path, "rb") as f:
+        return f.read(len(BINARY_WORDLIST_MAGIC)) == BINARY_WORDLIST_MAGIC
+
+
+def write_binary_wordlist(binary_path, wordlist, alphabet=None):
+    if alphabet is None:
+        alphabet = "".join(sorted(set("".join(wordlist))))
+    if len(alphabet) > 256:
+        raise ValueError("binary wordlists support at most 256 letters")
+    encoding_table = {ord(char): code for code, char in enumerate(alphabet)}
+    if isinstance(wordlist, dict):
+        wordlist = [word for words in wordlist.values() for word in words]
+    wordlists = get_length_buckets([word for word in wordlist if are_letters_in_alphabet(word, alphabet)])
+    alphabet_bytes = alphabet.encode("utf-8")
+    offset = BINARY_WORDLIST_HEADER.size + len(alphabet_bytes) + 4 + len(wordlists) * BINARY_WORDLIST_TABLE_ENTRY.size
+    table = []
+    for word_length, words in wordlists.items():
+        table.append(BINARY_WORDLIST_TABLE_ENTRY.pack(word_length, len(words), offset))
+        offset += word_length * len(words)
+    with open(binary_path, "wb") as f:
+        f.write(BINARY_WORDLIST_HEADER.pack(BINARY_WORDLIST_MAGIC, BINARY_WORDLIST_FORMAT_VERSION, 1, len(alphabet_bytes)))
+        f.write(alphabet_bytes)
+        f.write(struct.pack("<I", len(wordlists)))
+        f.write(b"".join(table))
+        for words in wordlists.values():
+            f.write("".join(words).translate(encoding_table).encode("latin-1"))
+
+
+def get_alphabet_deletion_table(alphabet):
+    # word.translate(table) is empty if and only if all the letters of word are in alphabet
+    return str.maketrans("", "", alphabet.lower())
+
+
+def get_word_frequency(columns, frequency_column):
+    # frequency_column counts from 1, the word itself being in column 1
+    try:
+        return float(columns[frequency_column - 1])
+    except (IndexError, ValueError):
+        return
+
+
+def sort_words_by_frequency(words, frequencies, frequency_is_rank=False):
+    # the most common words first, words without a frequency last (in their original order)
+    if frequency_is_rank:
+        key = lambda word_id: (frequencies[word_id] is None, frequencies[word_id] or 0)
+    else:
+        key = lambda word_id: (frequencies[word_id] is None, -(frequencies[word_id] or 0))
+    return [words[word_id] for word_id in sorted(range(len(words)), key=key)]
+
+
+def open_binary_wordlist(wordlist_path):
+    # the words stay in the memory map instead of a list, the caller closes it
+    return MappedWordlist(wordlist_path)
+
+
+def get_wordlist(wordlist_path, alphabet=None, lengths=None, frequency_column=None, frequency_is_rank=False):
+    # words that are not of the given lengths or have letters not in alphabet are dropped while reading,
+    # with frequency_column the words are sorted by the frequencies (or ranks) in that column
     if not isinstance(wordlist_path, Path):
         wordlist_path = Path(wordlist_path)
+    if is_binary_wordlist(wordlist_path):
+        deletion_table = get_alphabet_deletion_table(alphabet) if alphabet is not None else None
+        wordlist = []
+        with MappedWordlist(wordlist_path) as mapped_wordlist:
+            for length, words in mapped_wordlist.wordlists.items():
+                if lengths is None or length in lengths:
+                    wordlist.extend(word for word in words if deletion_table is None or not word.translate(deletion_table))
+        return wordlist
     wordlist = []
+    frequencies = []
+    for word, frequency in iterate_wordlist_file(wordlist_path, alphabet, lengths, frequency_column):
+        wordlist.append(word)
+        frequencies.append(frequency)
+    if frequency_column is not None:
+        return sort_words_by_frequency(wordlist, frequencies, frequency_is_rank)
+    return wordlist
+
+
+def iterate_wordlist_file(wordlist_path, alphabet=None, lengths=None, frequency_column=None):
+    # (word, frequency) pairs of a text wordlist, the frequency is None without frequency_column
+    deletion_table = get_alphabet_deletion_table(alphabet) if alphabet is not None else None
     with open(wordlist_path, "r", encoding = "utf-8") as f:
         for line in f:
-            word = line.split("\t")[0].strip().lower()
-            if word:
-                wordlist.append(word)
-    return wordlist
+            columns = line.split("\t")
+            word = columns[0].strip().lower()
+            if not word:
+                continue
+            if lengths is not None and len(word) not in lengths:
+                continue
+            if deletion_table is not None and word.translate(deletion_table):
+                continue
+            yield word, (get_word_frequency(columns, frequency_column) if frequency_column is not None else None)
+
+
+def get_wordlist_cache_path(wordlist_path):
+    wordlist_path = Path(wordlist_path)
+    return wordlist_path.with_name(f"{wordlist_path.name}{WORDLIST_CACHE_SUFFIX}")
+
+
+def get_wordlist_fingerprint(wordlist_path, alphabet, frequency_column=None, frequency_is_rank=False):
+    wordlist_path = Path(wordlist_path)
+    stat = wordlist_path.stat()
+    return (WORDLIST_CACHE_FORMAT_VERSION, str(wordlist_path.resolve()), stat.st_mtime_ns, stat.st_size, alphabet, frequency_column, frequency_is_rank)
+
+
+def read_wordlist_cache_offsets(f, fingerprint):
+    # offsets of the lengths in the cache file f, None if the cache is stale
+    if pickle.load(f) != fingerprint:
+        return
+    f.seek(-WORDLIST_CACHE_TRAILER.size, os.SEEK_END)
+    index_offset, = WORDLIST_CACHE_TRAILER.unpack(f.read(WORDLIST_CACHE_TRAILER.size))
+    f.seek(index_offset)
+    return pickle.load(f)
+
+
+def get_cached_lengths(cache_path, fingerprint):
+    try:
+        with open(cache_path, "rb") as f:
+            offsets = read_wordlist_cache_offsets(f, fingerprint)
+            return None if offsets is None else list(offsets.keys())
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError, struct.error):
+        return
+
+
+def read_wordlist_cache(cache_path, fingerprint, lengths=None):
+    # the fingerprint is pickled separately so that a stale cache is rejected before loading the words,
+    # each length is pickled separately and only the given lengths are loaded
+    try:
+        with open(cache_path, "rb") as f:
+            if (offsets := read_wordlist_cache_offsets(f, fingerprint)) is None:
+                return
+            wordlists = dict()
+            for length, offset in offsets.items():
+                if lengths is None or length in lengths:
+                    f.seek(offset)
+                    wordlists[length] = pickle.load(f)
+            return wordlists
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError, struct.error):
+        return
+
+
+def write_wordlist_cache(cache_path, fingerprint, wordlists):
+    # wordlists as a dict or as (length, words) pairs, which are then pickled one at a time
+    length_buckets = wordlists.items() if isinstance(wordlists, dict) else wordlists
+    temp_path = cache_path.with_name(f"{cache_path.name}.tmp")
+    try:
+        with open(temp_path, "wb") as f:
+            pickle.dump(fingerprint, f, protocol=pickle.HIGHEST_PROTOCOL)
+            offsets = dict()
+            for length, words in length_buckets:
+                offsets[length] = f.tell()
+                pickle.dump(words, f, protocol=pickle.HIGHEST_PROTOCOL)
+            index_offset = f.tell()
+            pickle.dump(offsets, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.write(WORDLIST_CACHE_TRAILER.pack(index_offset))
+        os.replace(temp_path, cache_path)
+    except OSError:
+        return False
+    return True
+
+
+def get_compiled_wordlist(wordlist_path, alphabet=None, use_cache=True, lengths=None, frequency_column=None, frequency_is_rank=False):
+    # only the words of the given lengths if lengths is not None,
+    # each length bucket is sorted by frequency if frequency_column is given (binary wordlists are already in order)
+    if is_binary_wordlist(wordlist_path):
+        mapped_wordlist = open_binary_wordlist(wordlist_path)
+        if alphabet is None or set(mapped_wordlist.alphabet) <= set(alphabet.lower()):
+            # the buckets read the memory map, it is closed with WordlistIndex.close
+            return get_wordlists_of_lengths(mapped_wordlist.wordlists, lengths)
+        deletion_table = get_alphabet_deletion_table(alphabet)
+        with mapped_wordlist:
+            wordlists = dict()
+            for length, words in get_wordlists_of_lengths(mapped_wordlist.wordlists, lengths).items():
+                words = [word for word in words if not word.translate(deletion_table)]
+                if words:
+                    wordlists[length] = words
+            return wordlists
+    if not use_cache:
+        with stats.timer("load wordlist"):
+            return get_length_buckets(get_wordlist(wordlist_path, alphabet, lengths, frequency_column, frequency_is_rank))
+    # the cache has all the lengths, so that it is good for any puzzle
+    cache_path = get_wordlist_cache_path(wordlist_path)
+    fingerprint = get_wordlist_fingerprint(wordlist_path, alphabet, frequency_column, frequency_is_rank)
+    if (wordlists := read_wordlist_cache(cache_path, fingerprint, lengths)) is not None:
+        return wordlists
+    with stats.timer("load wordlist"):
+        return compile_wordlist_cache(wordlist_path, cache_path, fingerprint, alphabet, lengths, frequency_column, frequency_is_rank)
+
+
+def compile_wordlist_cache(wordlist_path, cache_path, fingerprint, alphabet=None, lengths=None, frequency_column=None, frequency_is_rank=False):
+    # each length is cached on its own, so only the given lengths (and one more) are in memory at a time
+    wordlists = dict()
+
+    def keep_given_lengths(length_buckets):
+        for length, words in length_buckets:
+            if lengths is None or length in lengths:
+                wordlists[length] = words
+            yield length, words
+
+    length_buckets = keep_given_lengths(iterate_length_buckets_of_file(wordlist_path, alphabet, frequency_column, frequency_is_rank))
+    write_wordlist_cache(cache_path, fingerprint, length_buckets)
+    # the lengths that were not read yet if the cache could not be written
+    deque(length_buckets, maxlen=0)
+    return wordlists
+
+
+def iterate_length_buckets_of_file(wordlist_path, alphabet=None, frequency_column=None, frequency_is_rank=False):
+    # (length, words) of a text wordlist, one length at a time: the words are first written to a temporary file
+    # for each length, and each length is read back and sorted only when it is its turn
+    with tempfile.TemporaryDirectory() as temp_folder:
+        spill_paths = dict()
+        spill_files = dict()
+        try:
+            for word, frequency in iterate_wordlist_file(wordlist_path, alphabet, None, frequency_column):
+                spill_file = spill_files.get(len(word))
+                if spill_file is None:
+                    spill_paths[len(word)] = Path(temp_folder) / f"{len(word)}.txt"
+                    spill_file = open(spill_paths[len(word)], "w", encoding="utf-8")
+                    spill_files[len(word)] = spill_file
+                spill_file.write(f"{word}\t{'' if frequency is None else repr(frequency)}\n")
+        finally:
+            for spill_file in spill_files.values():
+                spill_file.close()
+
+        for length, spill_path in spill_paths.items():
+            words = []
+            frequencies = []
+            with open(spill_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    word, frequency = line.rstrip("\n").split("\t")
+                    words.append(word)
+                    frequencies.append(float(frequency) if frequency else None)
+            if frequency_column is not None:
+                words = sort_words_by_frequency(words, frequencies, frequency_is_rank)
+            yield length, words
+
+
+def iterate_compiled_wordlist(wordlist_path, alphabet=None, use_cache=True, lengths=None, frequency_column=None, frequency_is_rank=False):
+    # (length, words) like get_compiled_wordlist gives them, but one length at a time,
+    # so that a WordTrie can be built without every word list in memory at once
+    if is_binary_wordlist(wordlist_path):
+        yield from get_compiled_wordlist(wordlist_path, alphabet, use_cache, lengths).items()
+        return
+    cached_lengths = None
+    if use_cache:
+        cache_path = get_wordlist_cache_path(wordlist_path)
+        fingerprint = get_wordlist_fingerprint(wordlist_path, alphabet, frequency_column, frequency_is_rank)
+        if (cached_lengths := get_cached_lengths(cache_path, fingerprint)) is None:
+            compile_wordlist_cache(wordlist_path, cache_path, fingerprint, alphabet, set(), frequency_column, frequency_is_rank)
+            cached_lengths = get_cached_lengths(cache_path, fingerprint)
+    if cached_lengths is None:
+        for length, words in iterate_length_buckets_of_file(wordlist_path, alphabet, frequency_column, frequency_is_rank):
+            if lengths is None or length in lengths:
+                yield length, words
+        return
+    for length in cached_lengths:
+        if lengths is None or length in lengths:
+            wordlists = read_wordlist_cache(cache_path, fingerprint, {length})
+            if wordlists is None:
+                raise ValueError(f"the cache of {wordlist_path} changed while it was read")
+            yield length, wordlists[length]
+
+
+def get_wordlists_of_lengths(wordlists, lengths=None):
+    if lengths is None:
+        return wordlists
+    return {length: words for length, words in wordlists.items() if length in lengths}
 
 
 def get_csv_files_in_folder(folder_path=None):
@@ -89,26 +536,62 @@ def get_codeword_path(path_str, folder_path=None):
 def get_codewords(codeword_path):
     if not isinstance(codeword_path, Path):
         codeword_path = Path(codeword_path)
+    with open(codeword_path, "r", encoding = "utf-8") as f:
+        return get_codewords_from_lines(f)
+
+
+def get_codewords_from_lines(lines):
     comments = []
     codewords = []
-    with open(codeword_path, "r", encoding = "utf-8") as f:
-        for line in f:
-            if "#" in line:
-                comment = line.strip().split("#")[1].strip()
-                comments.append(comment)
-                continue
-            nums_str = line.strip().split(",")
-            if not nums_str:
-                continue
-            nums_str.append("")
-            nums = nums_str[:nums_str.index("")]
-            if not nums:
-                continue
-            word = tuple(int(num) for num in nums)
-            codewords.append(word)
+    for line in lines:
+        if "#" in line:
+            comment = line.strip().split("#")[1].strip()
+            comments.append(comment)
+            continue
+        nums_str = line.strip().split(",")
+        if not nums_str:
+            continue
+        nums_str.append("")
+        nums = nums_str[:nums_str.index("")]
+        if not nums:
+            continue
+        word = tuple(int(num) for num in nums)
+        codewords.append(word)
     return comments, codewords
 
 
+def get_file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def get_session_path(codeword_path):
+    codeword_path = Path(codeword_path)
+    return codeword_path.with_name(f"{codeword_path.name}{SESSION_SUFFIX}")
+
+
+def write_session(session_path, session):
+    with open(session_path, "w", encoding="utf-8") as f:
+        json.dump(session, f, ensure_ascii=False)
+
+
+def read_session(session_path):
+    with open(session_path, "r", encoding="utf-8") as f:
+        session = json.load(f)
+    if session.get("version") != SESSION_FORMAT_VERSION:
+        raise ValueError(f"{session_path} is not a session file of version {SESSION_FORMAT_VERSION}")
+    return session
+
+
+def write_codewords(codeword_path, codewords, comments=()):
+    # in the format read by get_codewords
+    with open(codeword_path, "w", encoding = "utf-8") as f:
+        for comment in comments:
+            f.write(f"# {comment}\n")
+        for codeword in codewords:
+            f.write(", ".join(str(num) for num in codeword) + "\n")
+
+
 def are_letters_in_alphabet(word, alphabet):
     if alphabet is None:
         return True
@@ -119,9 +602,84 @@ def are_letters_in_alphabet(word, alphabet):
     return True
 
 
+class Substitution:
+    # number -> letter and letter -> number lookups from lists indexed by the number and by the position of the letter in the alphabet
+
+    def __init__(self, alphabet=None, pairs=None):
+        self.char_indices = dict() if alphabet is None else {char: i for i, char in enumerate(alphabet)}
+        self.nums_by_char_index = [None] * len(self.char_indices)
+        self.chars_by_num = []
+        self.size = 0
+        if pairs is not None:
+            for num, char in pairs:
+                self.add(num, char)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        # pairs sorted by number, just like substitution tuples
+        for num, char in enumerate(self.chars_by_num):
+            if char is not None:
+                yield num, char
+
+    def copy(self):
+        substitution = Substitution()
+        substitution.char_indices = self.char_indices
+        substitution.nums_by_char_index = self.nums_by_char_index.copy()
+        substitution.chars_by_num = self.chars_by_num.copy()
+        substitution.size = self.size
+        return substitution
+
+    def get_char(self, num):
+        if 0 <= num < len(self.chars_by_num):
+            return self.chars_by_num[num]
+
+    def get_num(self, char):
+        char_index = self.char_indices.get(char)
+        if char_index is not None:
+            return self.nums_by_char_index[char_index]
+
+    def find(self, num_or_char):
+        if isinstance(num_or_char, str):
+            return self.get_num(num_or_char)
+        return self.get_char(num_or_char)
+
+    def add(self, num, char):
+        # like get_substitution_tuple, the first letter given to a number is kept
+        if num < 0:
+            raise ValueError(f"{num} is not a valid number")
+        if num >= len(self.chars_by_num):
+            self.chars_by_num.extend([None] * (num + 1 - len(self.chars_by_num)))
+        if self.chars_by_num[num] is not None:
+            return False
+        self.chars_by_num[num] = char
+        self.size += 1
+        char_index = self.char_indices.get(char)
+        if char_index is None:
+            # the alphabet list is shared between copies, so it is copied before adding letters
+            self.char_indices = {**self.char_indices, char: len(self.char_indices)}
+            char_index = len(self.nums_by_char_index)
+            self.nums_by_char_index.append(None)
+        if self.nums_by_char_index[char_index] is None:
+            self.nums_by_char_index[char_index] = num
+        return True
+
+    def add_word(self, codeword, word):
+        for num, char in zip(codeword, word):
+            self.add(num, char)
+
+    def with_word(self, codeword, word):
+        substitution = self.copy()
+        substitution.add_word(codeword, word)
+        return substitution
+
+
 def find_correspondence(num_or_char, correspondence_tuple):
     if correspondence_tuple is None:
         return
+    if isinstance(correspondence_tuple, Substitution):
+        return correspondence_tuple.find(num_or_char)
     for num, char in correspondence_tuple:
         if num_or_char == num:
             return char
@@ -153,10 +711,12 @@ def count_in_how_many_words_numbers_are(codewords):
 
 def get_substitution_tuple(codewords, words, previous_substitution_tuple=None):
     substitution_pairs = [] if previous_substitution_tuple is None else list(previous_substitution_tuple)
+    nums_in_pairs = {num for num, _ in substitution_pairs}
     for codeword, word in zip(codewords, words):
         for num, char in zip(codeword, word):
-            if num in [c_r for c_r, c in substitution_pairs]:
+            if num in nums_in_pairs:
                 continue
+            nums_in_pairs.add(num)
             substitution_pairs.append((num, char))
     return tuple(sorted(substitution_pairs, key=lambda p: p[0]))
 
@@ -178,6 +738,8 @@ def decrypt_codewords(codewords, substitution_tuple, not_found_symbol="?"):
 
 
 def does_word_match(word, codeword):
+    if stats.enabled:
+        stats.count("does_word_match calls")
     if len(word) != len(codeword):
         return False
     for i, chars in enumerate(zip(word, codeword)):
@@ -192,7 +754,26 @@ def does_word_match(word, codeword):
     return True
 
 
+def get_word_pattern(word):
+    # e.g. "kakku" and (4, 1, 4, 4, 7) both give (0, 1, 0, 0, 2)
+    first_indices = dict()
+    return tuple(first_indices.setdefault(char, len(first_indices)) for char in word)
+
+
+def does_word_match_to_substitution(word, codeword, substitution):
+    for char, num in zip(word, codeword):
+        expected_char = substitution.get_char(num)
+        if expected_char is None:
+            if substitution.get_num(char) is not None:
+                return False
+        elif expected_char != char:
+            return False
+    return True
+
+
 def does_word_match_to_substitution_tuple(word, codeword, substitution_tuple):
+    if isinstance(substitution_tuple, Substitution):
+        return does_word_match_to_substitution(word, codeword, substitution_tuple)
     try:
         letters_in_tuple = [char for _, char in substitution_tuple]
     except TypeError:
@@ -225,6 +806,17 @@ def get_nums_and_indices_dict(codeword):
     return indices
 
 
+def get_codewords_by_num(codewords):
+    codewords_by_num = dict()
+    for codeword in codewords:
+        for num in set(codeword):
+            if codewords_by_num.get(num) is None:
+                codewords_by_num[num] = [codeword]
+            elif codeword not in codewords_by_num[num]:
+                codewords_by_num[num].append(codeword)
+    return codewords_by_num
+
+
 def get_matching_indices(codeword1, codeword2):
     indices1 = get_nums_and_indices_dict(codeword1)
     indices2 = get_nums_and_indices_dict(codeword2)
@@ -255,7 +847,85 @@ def do_words_match_to_matching_indices(word1, word2, matching_indices, indices_i
     return True
 
 
-def get_matching_words(codeword, wordlist, maximum_matched_words=None):
+def group_words_by_indices(words, indices, values=None):
+    # values (e.g. pairs of words and letter masks) are grouped by the letters of the words at indices
+    if values is None:
+        values = words
+    if not indices:
+        return {"": list(values)}
+    get_key = itemgetter(*indices)
+    groups = dict()
+    for word, value in zip(words, values):
+        key = get_key(word)
+        if groups.get(key) is None:
+            groups[key] = [value]
+            continue
+        groups[key].append(value)
+    return groups
+
+
+def get_letter_mask(word, letter_bits):
+    letter_mask = 0
+    for char in word:
+        letter_mask |= letter_bits[char]
+    return letter_mask
+
+
+def match_word_lists(words1, words2, matching_indices, indices_in_1, indices_in_2, maximum_matches, letter_masks1=None, letter_masks2=None):
+    # hash join: words2 is grouped by its letters at the matching indices,
+    # so only pairs that agree there are checked for letters they should not share
+    indices1 = [index1 for index1, _ in matching_indices]
+    indices2 = [index2 for _, index2 in matching_indices]
+    get_key = itemgetter(*indices1) if indices1 else lambda word: ""
+    matching_pairs = []
+    if letter_masks1 is None or letter_masks2 is None:
+        words2_by_key = group_words_by_indices(words2, indices2)
+        for word1 in words1:
+            for word2 in words2_by_key.get(get_key(word1), ()):
+                if do_words_match_to_matching_indices(word1, word2, (), indices_in_1, indices_in_2):
+                    matching_pairs.append((word1, word2))
+                    if len(matching_pairs) > maximum_matches:
+                        return []
+        return matching_pairs
+    # words that agree at the matching indices share those letters,
+    # so they share no other letter exactly when they have as many letters in common as there are matching indices
+    num_of_shared_letters = len(matching_indices)
+    words2_by_key = group_words_by_indices(words2, indices2, list(zip(words2, letter_masks2)))
+    for word1, letter_mask1 in zip(words1, letter_masks1):
+        for word2, letter_mask2 in words2_by_key.get(get_key(word1), ()):
+            if (letter_mask1 & letter_mask2).bit_count() == num_of_shared_letters:
+                matching_pairs.append((word1, word2))
+                if len(matching_pairs) > maximum_matches:
+                    return []
+    return matching_pairs
+
+
+# candidate lists and their letter masks of the codewords, given to each pair worker once when the pool starts
+pair_worker_matched_words = dict()
+
+
+def initialize_pair_worker(matched_words):
+    global pair_worker_matched_words
+    pair_worker_matched_words = matched_words
+
+
+def match_codeword_pairs_in_worker(codeword_pairs, maximum_matches, changed_matched_words):
+    # changed_matched_words has the candidate lists that have changed since the pool was started
+    matched_pairs = []
+    for codeword1, codeword2 in codeword_pairs:
+        matching_indices, others1, others2 = get_matching_indices(codeword1, codeword2)
+        words1, letter_masks1 = changed_matched_words.get(codeword1) or pair_worker_matched_words[codeword1]
+        words2, letter_masks2 = changed_matched_words.get(codeword2) or pair_worker_matched_words[codeword2]
+        matched_pairs.append(match_word_lists(words1, words2, matching_indices, others1, others2, maximum_matches, letter_masks1, letter_masks2))
+    return matched_pairs
+
+
+def get_matching_words(codeword, wordlist, maximum_matched_words=None, wordlist_index=None):
+    if wordlist_index is not None:
+        matched_words = wordlist_index.get_matching_words(codeword)
+        if maximum_matched_words is not None:
+            return matched_words[:maximum_matched_words + 1]
+        return matched_words
     if not wordlist:
         return []
     matched_words = []
@@ -303,7 +973,665 @@ def mass_replace(word, *replacements):
     return final_word
 
 
+def get_length_buckets(wordlist):
+    if isinstance(wordlist, (MappedWordlist, WordTrie)):
+        return wordlist.wordlists
+    wordlists = dict()
+    for word in wordlist:
+        num = len(word)
+        if wordlists.get(num) is None:
+            wordlists[num] = [word]
+            continue
+        wordlists[num].append(word)
+    return wordlists
+
+
+def get_pattern_index(words):
+    pattern_index = dict()
+    for word_id, word in enumerate(words):
+        pattern = get_word_pattern(word)
+        if pattern_index.get(pattern) is None:
+            pattern_index[pattern] = [word_id]
+            continue
+        pattern_index[pattern].append(word_id)
+    return pattern_index
+
+
+# turns the digits of bin(bitset) into bytes 0 and 1 for itertools.compress
+BINARY_DIGIT_TABLE = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def get_bitset_from_word_ids(word_ids):
+    if not word_ids:
+        return 0
+    bit_array = bytearray(max(word_ids) // 8 + 1)
+    for word_id in word_ids:
+        bit_array[word_id >> 3] |= 1 << (word_id & 7)
+    return int.from_bytes(bit_array, "little")
+
+
+def get_word_ids_from_bitset(bitset):
+    bits = bin(bitset)[:1:-1].encode("ascii").translate(BINARY_DIGIT_TABLE)
+    return list(compress(range(len(bits)), bits))
+
+
+def get_bits(mask):
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
+
+
+def find_augmenting_path(num, letter_domains, nums_by_letter, visited_letters):
+    for letter in get_bits(letter_domains[num]):
+        if letter in visited_letters:
+            continue
+        visited_letters.add(letter)
+        other_num = nums_by_letter.get(letter)
+        if other_num is None or find_augmenting_path(other_num, letter_domains, nums_by_letter, visited_letters):
+            nums_by_letter[letter] = num
+            return True
+    return False
+
+
+def get_letter_matching(letter_domains):
+    # a different letter for each number, or None if there are not enough letters to go around
+    nums_by_letter = dict()
+    for num in letter_domains.keys():
+        if not find_augmenting_path(num, letter_domains, nums_by_letter, set()):
+            return None
+    return nums_by_letter
+
+
+def get_strongly_connected_components(graph):
+    # Tarjan's algorithm, components[vertex] is the same for vertices in the same component
+    indices = dict()
+    lowlinks = dict()
+    stack = []
+    on_stack = set()
+    components = dict()
+
+    def visit(vertex):
+        indices[vertex] = lowlinks[vertex] = len(indices)
+        stack.append(vertex)
+        on_stack.add(vertex)
+        for next_vertex in graph[vertex]:
+            if next_vertex not in indices:
+                visit(next_vertex)
+                lowlinks[vertex] = min(lowlinks[vertex], lowlinks[next_vertex])
+            elif next_vertex in on_stack:
+                lowlinks[vertex] = min(lowlinks[vertex], indices[next_vertex])
+        if lowlinks[vertex] == indices[vertex]:
+            while True:
+                component_vertex = stack.pop()
+                on_stack.discard(component_vertex)
+                components[component_vertex] = indices[vertex]
+                if component_vertex == vertex:
+                    break
+
+    for vertex in graph.keys():
+        if vertex not in indices:
+            visit(vertex)
+    return components
+
+
+def prune_letter_domains(letter_domains):
+    # letter_domains[num] is a bitmask of the letters num can still be,
+    # only letters that some one-to-one assignment of letters to all the numbers uses are kept (Regin's all-different),
+    # returns None if there is no such assignment
+    nums_by_letter = get_letter_matching(letter_domains)
+    if nums_by_letter is None:
+        return None
+    letters_by_num = {num: letter for letter, num in nums_by_letter.items()}
+    # numbers point to their other letters, letters point to the number they are matched with
+    graph = dict()
+    all_letters = 0
+    for num, letter_domain in letter_domains.items():
+        all_letters |= letter_domain
+        graph[("num", num)] = [("letter", letter) for letter in get_bits(letter_domain ^ letters_by_num[num])]
+    reverse_graph = {vertex: [] for vertex in graph.keys()}
+    for letter in get_bits(all_letters):
+        num = nums_by_letter.get(letter)
+        graph[("letter", letter)] = [] if num is None else [("num", num)]
+        reverse_graph[("letter", letter)] = []
+    for vertex, next_vertices in graph.items():
+        for next_vertex in next_vertices:
+            reverse_graph[next_vertex].append(vertex)
+    # a letter is free to use if a letter without a number can be reached from it
+    free_vertices = [("letter", letter) for letter in get_bits(all_letters) if letter not in nums_by_letter]
+    vertices_reaching_free = set(free_vertices)
+    while free_vertices:
+        vertex = free_vertices.pop()
+        for previous_vertex in reverse_graph[vertex]:
+            if previous_vertex not in vertices_reaching_free:
+                vertices_reaching_free.add(previous_vertex)
+                free_vertices.append(previous_vertex)
+    components = get_strongly_connected_components(graph)
+    pruned_letter_domains = dict()
+    for num, letter_domain in letter_domains.items():
+        pruned_letter_domain = letters_by_num[num]
+        for letter in get_bits(letter_domain ^ letters_by_num[num]):
+            if components[("num", num)] == components[("letter", letter)] or ("letter", letter) in vertices_reaching_free:
+                pruned_letter_domain |= letter
+        pruned_letter_domains[num] = pruned_letter_domain
+    return pruned_letter_domains
+
+
+def set_bit_range(bit_array, start, num_of_bits):
+    end = start + num_of_bits
+    while start < end and start & 7:
+        bit_array[start >> 3] |= 1 << (start & 7)
+        start += 1
+    if end - start >= 8:
+        bit_array[start >> 3:end >> 3] = b"\xff" * ((end >> 3) - (start >> 3))
+        start = end & ~7
+    while start < end:
+        bit_array[start >> 3] |= 1 << (start & 7)
+        start += 1
+
+
+def get_position_letter_bitsets(words):
+    # bitsets[(position, char)] has bit word_id set if words[word_id][position] == char
+    num_of_bytes = (len(words) + 7) // 8
+    bit_arrays = dict()
+    for word_id, word in enumerate(words):
+        byte_index = word_id >> 3
+        bit = 1 << (word_id & 7)
+        for position, char in enumerate(word):
+            bit_array = bit_arrays.get((position, char))
+            if bit_array is None:
+                bit_array = bytearray(num_of_bytes)
+                bit_arrays[(position, char)] = bit_array
+            bit_array[byte_index] |= bit
+    return {key: int.from_bytes(bit_array, "little") for key, bit_array in bit_arrays.items()}
+
+
+class NumpyCandidateEngine:
+    # each length bucket as a 2-D array of letter codes, one row per word id
+    # blocks of pairs start small so that the search can stop early when maximum_matches is exceeded
+    MINIMUM_BLOCK_SIZE = 1 << 12
+    MAXIMUM_BLOCK_SIZE = 1 << 20
+
+    def __init__(self, wordlist_index):
+        self.wordlist_index = wordlist_index
+        alphabet = wordlist_index.alphabet.lower() if wordlist_index.alphabet else ""
+        self.letter_codes = {char: code for code, char in enumerate(dict.fromkeys(alphabet))}
+        self.word_matrices = dict()
+        self.letter_masks = dict()
+        self.pattern_word_ids = dict()
+
+    def get_letter_code(self, char):
+        code = self.letter_codes.get(char)
+        if code is None:
+            code = len(self.letter_codes)
+            self.letter_codes[char] = code
+        return code
+
+    def get_word_matrix(self, length):
+        word_matrix = self.word_matrices.get(length)
+        if word_matrix is not None:
+            return word_matrix
+        words = self.wordlist_index.wordlists.get(length, [])
+        codes = [self.get_letter_code(char) for word in words for char in word]
+        dtype = np.uint8 if len(self.letter_codes) <= 256 else np.uint16
+        word_matrix = np.array(codes, dtype=dtype).reshape(len(words), length)
+        self.word_matrices[length] = word_matrix
+        return word_matrix
+
+    def get_letter_masks(self, length):
+        # one bit per letter of each word, only if the letters fit in 64 bits
+        if length in self.letter_masks:
+            return self.letter_masks[length]
+        word_matrix = self.get_word_matrix(length)
+        letter_masks = None
+        if len(self.letter_codes) <= 64:
+            letter_masks = np.bitwise_or.reduce(np.left_shift(np.uint64(1), word_matrix.astype(np.uint64)), axis=1)
+        self.letter_masks[length] = letter_masks
+        return letter_masks
+
+    def get_pattern_mask(self, codeword):
+        word_matrix = self.get_word_matrix(len(codeword))
+        mask = np.ones(len(word_matrix), dtype=bool)
+        first_positions = dict()
+        for position, num in enumerate(codeword):
+            first_position = first_positions.get(num)
+            if first_position is not None:
+                mask &= word_matrix[:, position] == word_matrix[:, first_position]
+                continue
+            for previous_position in first_positions.values():
+                mask &= word_matrix[:, position] != word_matrix[:, previous_position]
+            first_positions[num] = position
+        return mask
+
+    def get_word_ids_from_bitset(self, bitset):
+        bits = bin(bitset)[:1:-1].encode("ascii").translate(BINARY_DIGIT_TABLE)
+        return np.flatnonzero(np.frombuffer(bits, dtype=np.uint8))
+
+    def get_word_ids_matching_codeword(self, codeword):
+        pattern = get_word_pattern(codeword)
+        word_ids = self.pattern_word_ids.get(pattern)
+        if word_ids is None:
+            word_ids = np.flatnonzero(self.get_pattern_mask(codeword))
+            self.pattern_word_ids[pattern] = word_ids
+        return word_ids
+
+    def get_candidate_bitset(self, codeword, substitution_dict, used_chars):
+        word_ids = self.get_word_ids_matching_codeword(codeword)
+        candidates = self.get_word_matrix(len(codeword))[word_ids]
+        mask = np.ones(len(word_ids), dtype=bool)
+        used_codes = [self.get_letter_code(char) for char in used_chars]
+        for position, num in enumerate(codeword):
+            char = substitution_dict[num]
+            if char:
+                mask &= candidates[:, position] == self.get_letter_code(char)
+            elif used_codes:
+                mask &= ~np.isin(candidates[:, position], used_codes)
+        return get_bitset_from_word_ids(word_ids[mask].tolist())
+
+    def match_word_ids(self, codeword1, word_ids1, codeword2, word_ids2, maximum_matches):
+        # same result as comparing every pair with do_words_match_to_matching_indices, one block of pairs at a time
+        matching_indices, others1, others2 = get_matching_indices(codeword1, codeword2)
+        word_ids1 = np.asarray(word_ids1, dtype=np.int64)
+        word_ids2 = np.asarray(word_ids2, dtype=np.int64)
+        if not len(word_ids1) or not len(word_ids2):
+            return []
+        words1 = self.get_word_matrix(len(codeword1))[word_ids1]
+        words2 = self.get_word_matrix(len(codeword2))[word_ids2]
+        letter_masks1 = self.get_letter_masks(len(codeword1))
+        letter_masks2 = self.get_letter_masks(len(codeword2))
+        if letter_masks1 is not None and letter_masks2 is not None:
+            letter_masks1 = letter_masks1[word_ids1]
+            letter_masks2 = letter_masks2[word_ids2]
+        block_size = self.MINIMUM_BLOCK_SIZE
+        matching_pairs = []
+        start = 0
+        while start < len(word_ids1):
+            num_of_rows = max(1, block_size // len(word_ids2))
+            block = words1[start:start + num_of_rows]
+            matches = np.ones((len(block), len(word_ids2)), dtype=bool)
+            for index1, index2 in matching_indices:
+                matches &= block[:, index1, None] == words2[None, :, index2]
+            if letter_masks1 is not None and letter_masks2 is not None:
+                # the words can only share the letters at the matching indices
+                shared_letters = np.zeros(len(block), dtype=np.uint64)
+                for index1, _ in matching_indices:
+                    shared_letters |= np.left_shift(np.uint64(1), block[:, index1].astype(np.uint64))
+                common_letters = letter_masks1[start:start + num_of_rows, None] & letter_masks2[None, :]
+                matches &= common_letters == shared_letters[:, None]
+            else:
+                for index1 in others1:
+                    for index2 in range(len(codeword2)):
+                        matches &= block[:, index1, None] != words2[None, :, index2]
+                for index2 in others2:
+                    for index1 in range(len(codeword1)):
+                        matches &= block[:, index1, None] != words2[None, :, index2]
+            rows, columns = np.nonzero(matches)
+            if len(matching_pairs) + len(rows) > maximum_matches:
+                return []
+            matching_pairs.extend(zip(word_ids1[rows + start].tolist(), word_ids2[columns].tolist()))
+            start += num_of_rows
+            block_size = min(2 * block_size, self.MAXIMUM_BLOCK_SIZE)
+        return matching_pairs
+
+
+class TrieWordBucket:
+    # words of one length in a WordTrie, word ids in the order of the original bucket
+
+    def __init__(self, word_trie, word_length):
+        self.word_trie = word_trie
+        self.word_length = word_length
+        self.num_of_words = word_trie.word_counts[word_trie.roots[word_length]]
+
+    def __len__(self):
+        return self.num_of_words
+
+    def __getitem__(self, word_id):
+        if isinstance(word_id, slice):
+            return [self[i] for i in range(*word_id.indices(self.num_of_words))]
+        if word_id < 0:
+            word_id += self.num_of_words
+        if not 0 <= word_id < self.num_of_words:
+            raise IndexError("word id out of range")
+        return self.word_trie.get_word(self.word_length, word_id)
+
+    def __iter__(self):
+        return self.word_trie.iterate_words(self.word_length)
+
+
+class WordTrie:
+    # the words of each length as a DAWG: nodes with the same endings below them are stored only once,
+    # also between lengths; edges of node i are edge_starts[i]:edge_starts[i + 1], sorted by letter,
+    # and word_counts[i] is the number of words through node i, which gives the trie ids (alphabetical);
+    # if a bucket was not in alphabetical order (e.g. sorted by frequency), ids_in_trie[length] and ids_in_bucket[length]
+    # map its word ids to trie ids and back, so the word ids stay in the original order
+
+    def __init__(self, wordlists):
+        # wordlists as a dict or as (length, words) pairs, e.g. from iterate_compiled_wordlist,
+        # so that only the words of one length are needed at a time; letters get codes as they come
+        self.letters = []
+        self.letter_codes = dict()
+        self.edge_starts = array("I", [0])
+        self.edge_letters = array("H")
+        self.edge_targets = array("I")
+        self.word_counts = array("Q")
+        self.roots = dict()
+        self.ids_in_trie = dict()
+        self.ids_in_bucket = dict()
+        registry = dict()
+        # node 0 is the end of every word
+        self.add_node((), registry)
+        length_buckets = wordlists.items() if isinstance(wordlists, dict) else wordlists
+        for length, words in length_buckets:
+            if len(words):
+                words = list(dict.fromkeys(words))
+                sorted_words = sorted(words)
+                self.roots[length] = self.add_words(sorted_words, registry)
+                if words != sorted_words:
+                    trie_ids = {word: trie_id for trie_id, word in enumerate(sorted_words)}
+                    ids_in_trie = array("I", [trie_ids[word] for word in words])
+                    ids_in_bucket = array("I", bytes(ids_in_trie.itemsize * len(words)))
+                    for word_id, trie_id in enumerate(ids_in_trie):
+                        ids_in_bucket[trie_id] = word_id
+                    self.ids_in_trie[length] = ids_in_trie
+                    self.ids_in_bucket[length] = ids_in_bucket
+        self.wordlists = {length: TrieWordBucket(self, length) for length in sorted(self.roots.keys())}
+
+    def __len__(self):
+        return sum(self.word_counts[root] for root in self.roots.values())
+
+    def add_node(self, edges, registry):
+        node = registry.get(edges)
+        if node is not None:
+            return node
+        node = len(self.word_counts)
+        for code, target in edges:
+            self.edge_letters.append(code)
+            self.edge_targets.append(target)
+        self.edge_starts.append(len(self.edge_letters))
+        self.word_counts.append(sum(self.word_counts[target] for _, target in edges) if edges else 1)
+        registry[edges] = node
+        return node
+
+    def freeze_path(self, path, depth, registry):
+        # nodes deeper than depth get no more words, so they can be stored (or found in the registry)
+        while len(path) - 1 > depth:
+            node = self.add_node(tuple(path.pop()), registry)
+            path[-1][-1] = (path[-1][-1][0], node)
+
+    def add_words(self, words, registry):
+        # words sorted, the edges of the nodes on the path of the previous word are still being added to
+        path = [[]]
+        previous_word = ""
+        for word in words:
+            common_length = 0
+            for char, previous_char in zip(word, previous_word):
+                if char != previous_char:
+                    break
+                common_length += 1
+            self.freeze_path(path, common_length, registry)
+            for char in word[common_length:]:
+                if char not in self.letter_codes:
+                    self.letter_codes[char] = len(self.letters)
+                    self.letters.append(char)
+                path[-1].append((self.letter_codes[char], None))
+                path.append([])
+            previous_word = word
+        self.freeze_path(path, 0, registry)
+        return self.add_node(tuple(path[0]), registry)
+
+    def get_word(self, length, word_id):
+        ids_in_trie = self.ids_in_trie.get(length)
+        if ids_in_trie is not None:
+            word_id = ids_in_trie[word_id]
+        node = self.roots[length]
+        chars = []
+        for _ in range(length):
+            for edge in range(self.edge_starts[node], self.edge_starts[node + 1]):
+                target = self.edge_targets[edge]
+                if word_id < self.word_counts[target]:
+                    chars.append(self.letters[self.edge_letters[edge]])
+                    node = target
+                    break
+                word_id -= self.word_counts[target]
+        return "".join(chars)
+
+    def iterate_words(self, length):
+        if length not in self.ids_in_trie:
+            yield from self.iterate_words_in_trie_order(length)
+            return
+        # the words are found one by one rather than all of them put in a list to reorder
+        for word_id in range(len(self.ids_in_trie[length])):
+            yield self.get_word(length, word_id)
+
+    def iterate_words_in_trie_order(self, length):
+        if length not in self.roots:
+            return
+        stack = [(self.roots[length], "")]
+        while stack:
+            node, prefix = stack.pop()
+            if len(prefix) == length:
+                yield prefix
+                continue
+            for edge in range(self.edge_starts[node + 1] - 1, self.edge_starts[node] - 1, -1):
+                stack.append((self.edge_targets[edge], prefix + self.letters[self.edge_letters[edge]]))
+
+    def get_word_ids(self, codeword, substitution_dict=None, used_chars=()):
+        # ids of the words with the pattern of codeword, the letters of substitution_dict in place
+        # and used_chars nowhere else, found by walking only the matching paths
+        root = self.roots.get(len(codeword))
+        if root is None:
+            return []
+        codes_by_num = dict()
+        if substitution_dict is not None:
+            for num in codeword:
+                if char := substitution_dict.get(num):
+                    if char not in self.letter_codes:
+                        return []
+                    codes_by_num[num] = self.letter_codes[char]
+        excluded_codes = {self.letter_codes[char] for char in used_chars if char in self.letter_codes}
+        word_ids = []
+        self.collect_word_ids(root, codeword, 0, 0, codes_by_num, excluded_codes, word_ids)
+        ids_in_bucket = self.ids_in_bucket.get(len(codeword))
+        if ids_in_bucket is not None:
+            return sorted(ids_in_bucket[trie_id] for trie_id in word_ids)
+        return word_ids
+
+    def collect_word_ids(self, node, codeword, position, word_id, codes_by_num, excluded_codes, word_ids):
+        if position == len(codeword):
+            word_ids.append(word_id)
+            return
+        num = codeword[position]
+        code = codes_by_num.get(num)
+        for edge in range(self.edge_starts[node], self.edge_starts[node + 1]):
+            target = self.edge_targets[edge]
+            edge_code = self.edge_letters[edge]
+            if code is not None:
+                if edge_code == code:
+                    self.collect_word_ids(target, codeword, position + 1, word_id, codes_by_num, excluded_codes, word_ids)
+                    return
+            elif edge_code not in excluded_codes:
+                # a new number gets a letter no other number of the word has
+                codes_by_num[num] = edge_code
+                excluded_codes.add(edge_code)
+                self.collect_word_ids(target, codeword, position + 1, word_id, codes_by_num, excluded_codes, word_ids)
+                excluded_codes.discard(edge_code)
+                del codes_by_num[num]
+            word_id += self.word_counts[target]
+
+    def get_position_letter_bitsets(self, length):
+        # as get_position_letter_bitsets of the words, but the words are not decoded:
+        # the trie ids below an edge are the word_counts[target] ids from the first one
+        root = self.roots.get(length)
+        if root is None:
+            return dict()
+        ids_in_bucket = self.ids_in_bucket.get(length)
+        bit_arrays = dict()
+        stack = [(root, 0, 0)]
+        while stack:
+            node, position, trie_id = stack.pop()
+            for edge in range(self.edge_starts[node], self.edge_starts[node + 1]):
+                target = self.edge_targets[edge]
+                num_of_words = self.word_counts[target]
+                key = (position, self.letters[self.edge_letters[edge]])
+                bit_array = bit_arrays.get(key)
+                if bit_array is None:
+                    bit_array = bytearray((self.word_counts[root] + 7) // 8)
+                    bit_arrays[key] = bit_array
+                if ids_in_bucket is None:
+                    set_bit_range(bit_array, trie_id, num_of_words)
+                else:
+                    for word_id in ids_in_bucket[trie_id:trie_id + num_of_words]:
+                        bit_array[word_id >> 3] |= 1 << (word_id & 7)
+                stack.append((target, position + 1, trie_id))
+                trie_id += num_of_words
+        return {key: int.from_bytes(bit_array, "little") for key, bit_array in bit_arrays.items()}
+
+    def get_letter_masks(self, length, letter_bits):
+        # the letters of each word as a bitmask, indexed by word id, letter_bits must have all of self.letters
+        root = self.roots.get(length)
+        if root is None:
+            return []
+        code_bits = [letter_bits[char] for char in self.letters]
+        letter_masks = []
+        stack = [(root, 0)]
+        while stack:
+            node, letter_mask = stack.pop()
+            if node == 0:
+                letter_masks.append(letter_mask)
+                continue
+            for edge in range(self.edge_starts[node + 1] - 1, self.edge_starts[node] - 1, -1):
+                stack.append((self.edge_targets[edge], letter_mask | code_bits[self.edge_letters[edge]]))
+        ids_in_trie = self.ids_in_trie.get(length)
+        if ids_in_trie is not None:
+            return [letter_masks[trie_id] for trie_id in ids_in_trie]
+        return letter_masks
+
+
+class WordlistIndex:
+    # word ids are positions in the length bucket self.wordlists[len(word)]
+
+    def __init__(self, wordlists, alphabet=None, use_numpy=False):
+        # wordlists can also be a WordTrie, then matching words are found by walking the trie
+        self.word_trie = wordlists if isinstance(wordlists, WordTrie) else None
+        if self.word_trie is not None:
+            wordlists = self.word_trie.wordlists
+        self.wordlists = wordlists
+        self.alphabet = alphabet
+        self.pattern_indices = dict()
+        self.pattern_bitsets = dict()
+        self.position_letter_bitsets = dict()
+        self.position_letters = dict()
+        # one bit for each letter of the alphabet, letters outside it get the next bits
+        self.letter_bits = {char: 1 << code for code, char in enumerate(dict.fromkeys(alphabet.lower() if alphabet else ""))}
+        self.letter_masks = dict()
+        # falls back to the pure Python path when NumPy is not installed
+        self.numpy_engine = NumpyCandidateEngine(self) if use_numpy and np is not None else None
+
+    def __len__(self):
+        return sum(len(words) for words in self.wordlists.values())
+
+    def close(self):
+        # closes the memory map of a binary wordlist, the words cannot be read after this
+        for words in self.wordlists.values():
+            if isinstance(words, MappedWordBucket) and not words.buffer.closed:
+                words.buffer.close()
+
+    def build(self, lengths=None):
+        # everything is otherwise built lazily, the first time a length is needed
+        if lengths is None:
+            lengths = self.wordlists.keys()
+        for length in lengths:
+            if self.word_trie is None:
+                self.get_pattern_index(length)
+            self.get_position_letter_bitsets(length)
+            self.get_letter_masks(length)
+            if self.numpy_engine is not None:
+                self.numpy_engine.get_word_matrix(length)
+                self.numpy_engine.get_letter_masks(length)
+
+    def get_pattern_index(self, length):
+        pattern_index = self.pattern_indices.get(length)
+        if pattern_index is None:
+            pattern_index = get_pattern_index(self.wordlists.get(length, []))
+            self.pattern_indices[length] = pattern_index
+        return pattern_index
+
+    def get_word_ids_matching_codeword(self, codeword):
+        if self.word_trie is not None:
+            return self.word_trie.get_word_ids(codeword)
+        if self.numpy_engine is not None:
+            return self.numpy_engine.get_word_ids_matching_codeword(codeword).tolist()
+        return self.get_pattern_index(len(codeword)).get(get_word_pattern(codeword), [])
+
+    def get_matching_words(self, codeword):
+        return self.get_words(len(codeword), self.get_word_ids_matching_codeword(codeword))
+
+    def get_words(self, length, word_ids):
+        words = self.wordlists.get(length)
+        if not words:
+            return []
+        return [words[word_id] for word_id in word_ids]
+
+    def get_bitset_matching_codeword(self, codeword):
+        pattern = get_word_pattern(codeword)
+        bitset = self.pattern_bitsets.get(pattern)
+        if bitset is None:
+            bitset = get_bitset_from_word_ids(self.get_word_ids_matching_codeword(codeword))
+            self.pattern_bitsets[pattern] = bitset
+        return bitset
+
+    def get_position_letter_bitsets(self, length):
+        bitsets = self.position_letter_bitsets.get(length)
+        if bitsets is None:
+            if self.word_trie is not None:
+                bitsets = self.word_trie.get_position_letter_bitsets(length)
+            else:
+                bitsets = get_position_letter_bitsets(self.wordlists.get(length, []))
+            self.position_letter_bitsets[length] = bitsets
+        return bitsets
+
+    def get_letter_masks(self, length):
+        # the letters of each word as a bitmask, indexed by word id
+        letter_masks = self.letter_masks.get(length)
+        if letter_masks is None:
+            letter_bits = self.letter_bits
+            if self.word_trie is not None:
+                for char in self.word_trie.letters:
+                    if char not in letter_bits:
+                        letter_bits[char] = 1 << len(letter_bits)
+                letter_masks = self.word_trie.get_letter_masks(length, letter_bits)
+            else:
+                letter_masks = []
+                for word in self.wordlists.get(length, []):
+                    for char in word:
+                        if char not in letter_bits:
+                            letter_bits[char] = 1 << len(letter_bits)
+                    letter_masks.append(get_letter_mask(word, letter_bits))
+            self.letter_masks[length] = letter_masks
+        return letter_masks
+
+    def get_position_letter_bitset(self, length, position, char):
+        return self.get_position_letter_bitsets(length).get((position, char), 0)
+
+    def get_position_letters(self, length, position):
+        position_letters = self.position_letters.get(length)
+        if position_letters is None:
+            position_letters = [[] for _ in range(length)]
+            for letter_position, char in self.get_position_letter_bitsets(length).keys():
+                position_letters[letter_position].append(char)
+            self.position_letters[length] = position_letters
+        return position_letters[position]
+
+
 class CodewordPuzzle:
+    MAXIMUM_MATCHED_PAIRS_CACHE_SIZE = 1_000_000
+    # starting worker processes is not worth it for fewer pairs than this
+    MINIMUM_PARALLEL_PAIRS = 200
+    CHUNKS_PER_WORKER = 4
+    # the pair workers are started again when a larger share of their candidate lists has changed
+    PAIR_WORKERS_RESTART_SHARE = 0.5
+    # older checkpoints of the interactive app and sessions are dropped, see drop_old_checkpoints
+    MAXIMUM_UNDO_STEPS = 100
 
     def get_nums_in_codewords(self):
         nums_in_codewords = []
@@ -318,17 +1646,174 @@ class CodewordPuzzle:
         if substitution_tuple:
             return substitution_tuple
     
+    def get_excluded_bitset(self, length, position, used_chars):
+        excluded_bitset = 0
+        for char in used_chars:
+            excluded_bitset |= self.wordlist_index.get_position_letter_bitset(length, position, char)
+        return excluded_bitset
+
+    def get_candidate_bitset(self, codeword, used_chars, excluded_bitsets):
+        # words that have the known letters in place and no known letter elsewhere
+        length = len(codeword)
+        bitset = self.matched_bitsets_all[codeword]
+        for position, num in enumerate(codeword):
+            if not bitset:
+                break
+            char = self.substitution_dict[num]
+            if char:
+                bitset &= self.wordlist_index.get_position_letter_bitset(length, position, char)
+                continue
+            if (excluded_bitset := excluded_bitsets.get((length, position))) is None:
+                excluded_bitset = self.get_excluded_bitset(length, position, used_chars)
+                excluded_bitsets[(length, position)] = excluded_bitset
+            bitset &= ~excluded_bitset
+        return bitset
+
+    def get_number_of_matches(self, codeword):
+        return self.matched_bitsets[codeword].bit_count()
+
+    def get_unsolved_nums_count(self, codeword):
+        return len([num for num in set(codeword) if not self.substitution_dict[num]])
+
+    def record_change(self, change):
+        # changes are only kept while a checkpoint is there to roll back to
+        self.redoable_changes = []
+        if self.checkpoints:
+            self.trail.append(change)
+
+    def write_candidates(self, codeword, bitset, words, version):
+        self.matched_bitsets[codeword] = bitset
+        self.candidate_versions[codeword] = version
+        if words is None:
+            self.matched_words.pop(codeword, None)
+            return
+        self.matched_words[codeword] = words
+
+    def set_candidates(self, codeword, bitset, words=None):
+        if bitset == self.matched_bitsets[codeword] and codeword in self.matched_words:
+            return False
+        if words is None:
+            words = self.wordlist_index.get_words(len(codeword), get_word_ids_from_bitset(bitset))
+        # a version number is never reused for different candidates, version 0 means the initial candidates
+        if bitset == self.matched_bitsets_all[codeword]:
+            version = 0
+        else:
+            self.latest_version += 1
+            version = self.latest_version
+        if stats.enabled:
+            stats.count("candidates eliminated", max(0, self.matched_bitsets[codeword].bit_count() - bitset.bit_count()))
+        # only the bitsets are kept in the trail, the words are found again when the change is applied
+        self.record_change(("candidates", codeword, self.matched_bitsets[codeword], self.candidate_versions[codeword], codeword in self.matched_words, bitset, version))
+        self.write_candidates(codeword, bitset, words, version)
+        return True
+
+    def get_candidate_words(self, codeword, bitset, version):
+        if version == 0:
+            return self.matched_words_all[codeword]
+        return self.wordlist_index.get_words(len(codeword), get_word_ids_from_bitset(bitset))
+
+    def write_substitution(self, num, char):
+        previous_char = self.substitution_dict[num]
+        if previous_char and not char:
+            for codeword in self.codewords_by_num[num]:
+                self.unsolved_nums_counts[codeword] += 1
+        elif char and not previous_char:
+            for codeword in self.codewords_by_num[num]:
+                self.unsolved_nums_counts[codeword] -= 1
+        self.substitution_dict[num] = char
+
+    def set_substitution(self, num, char):
+        self.record_change(("substitution", num, self.substitution_dict[num], char))
+        self.write_substitution(num, char)
+
+    def apply_change(self, change, undo=False):
+        if change[0] == "substitution":
+            _, num, previous_char, char = change
+            self.write_substitution(num, previous_char if undo else char)
+            return
+        _, codeword, previous_bitset, previous_version, had_words, bitset, version = change
+        if undo:
+            previous_words = self.get_candidate_words(codeword, previous_bitset, previous_version) if had_words else None
+            self.write_candidates(codeword, previous_bitset, previous_words, previous_version)
+            return
+        self.write_candidates(codeword, bitset, self.get_candidate_words(codeword, bitset, version), version)
+
+    def push_checkpoint(self):
+        self.checkpoints.append(len(self.trail))
+
+    def drop_old_checkpoints(self, maximum_checkpoints=None):
+        # the changes before the oldest kept checkpoint cannot be undone any more, so they are dropped
+        if maximum_checkpoints is None:
+            maximum_checkpoints = self.MAXIMUM_UNDO_STEPS
+        if len(self.checkpoints) <= maximum_checkpoints:
+            return
+        start = self.checkpoints[-maximum_checkpoints] if maximum_checkpoints else len(self.trail)
+        del self.checkpoints[:len(self.checkpoints) - maximum_checkpoints]
+        del self.trail[:start]
+        self.checkpoints = [checkpoint - start for checkpoint in self.checkpoints]
+
+    def rollback(self):
+        # returns the number of changes undone, or None if there is no checkpoint
+        if not self.checkpoints:
+            return
+        start = self.checkpoints.pop()
+        changes = self.trail[start:]
+        del self.trail[start:]
+        for change in reversed(changes):
+            self.apply_change(change, undo=True)
+        self.redoable_changes.append(changes)
+        return len(changes)
+
+    def redo(self):
+        if not self.redoable_changes:
+            return
+        changes = self.redoable_changes.pop()
+        self.checkpoints.append(len(self.trail))
+        for change in changes:
+            self.apply_change(change)
+        self.trail.extend(changes)
+        return len(changes)
+
+    @timed("set_matched_words")
     def set_matched_words(self):
-        substitution_tuple = self.get_substitution_tuple()
-        for codeword, words in self.matched_words_all.items():
-            # matching_indices = {i: self.substitution_dict[num] for i, num in enumerate(codeword) if self.substitution_dict[num]}
-            new_matched_words = []
-            for word in words:
-                if does_word_match_to_substitution_tuple(word, codeword, substitution_tuple):
-                    new_matched_words.append(word)
-                # if does_word_match_to_fixed_index_values(word, matching_indices):
-                #     new_matched_words.append(word)
-            self.matched_words[codeword] = new_matched_words
+        used_chars = [char for char in self.substitution_dict.values() if char]
+        excluded_bitsets = dict()
+        numpy_engine = self.wordlist_index.numpy_engine
+        word_trie = self.wordlist_index.word_trie
+        for codeword in self.matched_words_all.keys():
+            self.unsolved_nums_counts[codeword] = self.get_unsolved_nums_count(codeword)
+            if word_trie is not None:
+                bitset = get_bitset_from_word_ids(word_trie.get_word_ids(codeword, self.substitution_dict, used_chars))
+            elif numpy_engine is not None:
+                bitset = numpy_engine.get_candidate_bitset(codeword, self.substitution_dict, used_chars)
+            else:
+                bitset = self.get_candidate_bitset(codeword, used_chars, excluded_bitsets)
+            self.set_candidates(codeword, bitset)
+
+    def rematch_words(self):
+        # set_matched_words finds the candidates from the substitution alone,
+        # so the letters needed elsewhere are taken away from them again
+        self.set_matched_words()
+        return self.propagate_letter_domains()
+
+    def update_matched_words(self, num):
+        if stats.enabled:
+            stats.count("update_matched_words calls")
+        # num has just been given a letter that was not in use: only codewords with num need the letter
+        # in place, the others just lose the words with this letter at their unsolved positions
+        char = self.substitution_dict[num]
+        for codeword in self.codewords_by_num[num]:
+            position = codeword.index(num)
+            bitset = self.matched_bitsets[codeword] & self.wordlist_index.get_position_letter_bitset(len(codeword), position, char)
+            self.set_candidates(codeword, bitset)
+        for codeword, bitset in self.matched_bitsets.items():
+            if not bitset or not self.unsolved_nums_counts[codeword] or num in codeword:
+                continue
+            length = len(codeword)
+            for position, other_num in enumerate(codeword):
+                if not self.substitution_dict[other_num]:
+                    bitset &= ~self.wordlist_index.get_position_letter_bitset(length, position, char)
+            self.set_candidates(codeword, bitset)
 
     def is_codeword_solved(self, codeword):
         for num in codeword:
@@ -336,29 +1821,79 @@ class CodewordPuzzle:
                 return False
         return True
     
-    def __init__(self, codewords, wordlist, alphabet, comments):
+    def __init__(self, codewords, wordlist, alphabet, comments, wordlist_index=None, workers=1, candidate_bitsets=None):
         self.codewords = codewords
         self.alphabet = alphabet
         self.wordlist = wordlist
         self.comments = comments
+        self.workers = workers
 
         self.nums_in_codewords = self.get_nums_in_codewords()
         self.substitution_dict = {num: "" for num in self.nums_in_codewords}
 
-        self.wordlists = dict()
-        for word in self.wordlist:
-            num = len(word)
-            if self.wordlists.get(num) is None:
-                self.wordlists[num] = [word]
-                continue
-            self.wordlists[num].append(word)
+        if wordlist_index is None:
+            wordlist_index = WordlistIndex(get_length_buckets(self.wordlist), alphabet)
+        self.wordlist_index = wordlist_index
+        self.wordlists = self.wordlist_index.wordlists
         
-        self.matched_words_all = {codeword: get_matching_words(codeword, self.wordlists.get(len(codeword))) for codeword in self.codewords}
+        if candidate_bitsets is not None:
+            # initial candidates of a saved session, the words are only looked up by their ids
+            self.matched_bitsets_all = {codeword: candidate_bitsets[codeword] for codeword in self.codewords}
+            self.matched_words_all = {codeword: self.wordlist_index.get_words(len(codeword), get_word_ids_from_bitset(bitset)) for codeword, bitset in self.matched_bitsets_all.items()}
+        else:
+            with stats.timer("initial matching"):
+                self.matched_words_all = {codeword: self.wordlist_index.get_matching_words(codeword) for codeword in self.codewords}
+                self.matched_bitsets_all = {codeword: self.wordlist_index.get_bitset_matching_codeword(codeword) for codeword in self.codewords}
+        self.matched_bitsets = dict(self.matched_bitsets_all)
         self.matched_words = {codeword: words for codeword, words in self.matched_words_all.items() if words}
 
+        self.codewords_by_num = get_codewords_by_num(self.matched_words_all.keys())
+        self.unsolved_nums_counts = {codeword: len(set(codeword)) for codeword in self.matched_words_all.keys()}
+
+        # results of match_two_codewords, valid while the versions of both candidate lists stay the same
+        self.candidate_versions = {codeword: 0 for codeword in self.matched_words_all.keys()}
+        self.latest_version = 0
+        self.matched_pairs_cache = dict()
+        # letter masks of the candidates with the version they were made for
+        self.candidate_letter_masks = dict()
+        # pool of pair workers and the versions of the candidate lists it was started with
+        self.pair_executor = None
+        self.pair_executor_versions = dict()
+
+        self.neighbouring_codewords = dict()
+        self.search_steps = 0
+
+        # bit i of a letter domain stands for letters[i]
+        self.letters = list(self.alphabet)
+        self.letter_indices = {char: index for index, char in enumerate(self.letters)}
+
+        # trail of changes since the first checkpoint, see push_checkpoint and rollback
+        self.trail = []
+        self.checkpoints = []
+        self.redoable_changes = []
+
+    def get_session(self):
+        # candidates as bitsets of word ids in hexadecimal, in the order of self.codewords
+        return {
+            "substitution": {num: char for num, char in self.substitution_dict.items() if char},
+            "initial_candidates": [format(self.matched_bitsets_all[codeword], "x") for codeword in self.codewords],
+            "candidates": [format(self.matched_bitsets[codeword], "x") for codeword in self.codewords]
+        }
+
+    def restore_session(self, session):
+        # the words are the same as when the session was saved, so the candidates are taken as they are
+        for num, char in session["substitution"].items():
+            self.set_substitution(int(num), char)
+        for codeword, bitset_hex in zip(self.codewords, session["candidates"]):
+            if (bitset := int(bitset_hex, 16)) != self.matched_bitsets[codeword]:
+                self.set_candidates(codeword, bitset)
+
     def clear_substitution_dict(self):
-        self.substitution_dict = {num: "" for num in self.substitution_dict.keys()}
-        self.matched_words = self.matched_words_all
+        for num, char in self.substitution_dict.items():
+            if char:
+                self.set_substitution(num, "")
+        for codeword, bitset in self.matched_bitsets_all.items():
+            self.set_candidates(codeword, bitset, self.matched_words_all[codeword])
 
     def add_to_substitution_dict(self, num, char, issues=None, override=False):
         if num not in self.substitution_dict.keys():
@@ -366,8 +1901,10 @@ class CodewordPuzzle:
                 return issues["invalid number"]
             return True
         if char == "":
-            self.substitution_dict[num] = char
-            self.set_matched_words()
+            previous_char = self.substitution_dict[num]
+            self.set_substitution(num, char)
+            if previous_char:
+                self.rematch_words()
             return False
         if char.lower() not in [c.lower() for c in self.alphabet]:
             if issues:
@@ -377,13 +1914,20 @@ class CodewordPuzzle:
         if char in self.substitution_dict.values():
             if override:
                 previous_num = self.find_char_from_substitution_dict(char)
-                self.substitution_dict[previous_num] = ""
-                self.substitution_dict[num] = char
+                if previous_num != num:
+                    self.set_substitution(previous_num, "")
+                    self.set_substitution(num, char)
+                    self.rematch_words()
             if issues:
                 return issues["double letter"]
             return True
-        self.substitution_dict[num] = char
-        self.set_matched_words()
+        previous_char = self.substitution_dict[num]
+        self.set_substitution(num, char)
+        if previous_char:
+            # a letter was taken away, so candidates may come back
+            self.rematch_words()
+        else:
+            self.update_matched_words(num)
         return False
     
     def find_char_from_substitution_dict(self, char):
@@ -405,11 +1949,11 @@ class CodewordPuzzle:
     
     def find_codeword_with_least_matches(self):
         the_codeword = None
-        least_matches = len(self.wordlist)
+        least_matches = None
         for codeword, words in self.matched_words.items():
             if self.is_codeword_solved(codeword):
                 continue
-            if words and len(words) < least_matches:
+            if words and (least_matches is None or len(words) < least_matches):
                 the_codeword = codeword
                 least_matches = len(words)
         return the_codeword
@@ -429,48 +1973,45 @@ class CodewordPuzzle:
         # for char in codeword1:
         #     if matching_indices.get(char) is None:
         #         matching_indices[char] = [i for i, c in enumerate(codeword2) if c == char]
+        if not self.matched_bitsets[codeword1] or not self.matched_bitsets[codeword2]:
+            return []
+        if stats.enabled:
+            stats.count("match_two_codewords calls")
+            stats.count("word pairs to check", self.matched_bitsets[codeword1].bit_count() * self.matched_bitsets[codeword2].bit_count())
+        if (numpy_engine := self.wordlist_index.numpy_engine) is not None:
+            word_ids1 = numpy_engine.get_word_ids_from_bitset(self.matched_bitsets[codeword1])
+            word_ids2 = numpy_engine.get_word_ids_from_bitset(self.matched_bitsets[codeword2])
+            words1 = self.wordlists[len(codeword1)]
+            words2 = self.wordlists[len(codeword2)]
+            return [(words1[word_id1], words2[word_id2]) for word_id1, word_id2 in numpy_engine.match_word_ids(codeword1, word_ids1, codeword2, word_ids2, maximum_matches)]
         matching_indices, others1, others2 = get_matching_indices(codeword1, codeword2)
-
-        matching_pairs = []
-        for word1 in self.matched_words[codeword1]:
-            # extra_substitution_dict = {num: char for num, char in zip(codeword1, word1)}
-            # chars_in_word1 = tuple(extra_substitution_dict.values())
-            # extra_substitution_tuple = get_substitution_tuple([codeword1], [word1])
-            # m_indices = dict()
-            # for i, char in enumerate(word1):
-            #     if m_indices.get(char) is None:
-            #         m_indices[char] = [i]
-            #     else:
-            #         m_indices[char].append(i)
-                # m_indices[char] = matching_indices[codeword1[i]]
-            for word2 in self.matched_words[codeword2]:
-                if do_words_match_to_matching_indices(word1, word2, matching_indices, others1, others2):
-                    matching_pairs.append((word1, word2))
-                    if len(matching_pairs) > maximum_matches:
-                        return []
-                # if does_word_match_to_substitution_tuple(word2, codeword2, extra_substitution_tuple):
-                #     matching_pairs.append((word1, word2))
-                #     if len(matching_pairs) > maximum_matches:
-                #         return []
-                # for num, char in zip(codeword2, word2):
-                #     expected_char = extra_substitution_dict.get(num)
-                #     if expected_char is None and char in chars_in_word1:
-                #         break
-                #     if expected_char is None:
-                #         continue
-                #     if expected_char != char:
-                #         break
-                # else:
-                #     matching_pairs.append((word1, word2))
-                #     if len(matching_pairs) > maximum_matches:
-                #         return []
-                # if does_word_match_to_matching_indices(word2, m_indices):
-                # if do_two_words_match(word1, word2, codeword1, codeword2):
-                #     matching_pairs.append((word1, word2))
-                #     if len(matching_pairs) > maximum_matches:
-                #         return []
-        return matching_pairs
+        return match_word_lists(self.matched_words[codeword1], self.matched_words[codeword2], matching_indices, others1, others2, maximum_matches, self.get_letter_masks(codeword1), self.get_letter_masks(codeword2))
+
+    def get_letter_masks(self, codeword):
+        # letter masks of the candidates, in the same order as self.matched_words[codeword]
+        version = self.candidate_versions[codeword]
+        version_and_letter_masks = self.candidate_letter_masks.get(codeword)
+        if version_and_letter_masks is not None and version_and_letter_masks[0] == version:
+            return version_and_letter_masks[1]
+        all_letter_masks = self.wordlist_index.get_letter_masks(len(codeword))
+        letter_masks = [all_letter_masks[word_id] for word_id in get_word_ids_from_bitset(self.matched_bitsets[codeword])]
+        self.candidate_letter_masks[codeword] = (version, letter_masks)
+        return letter_masks
     
+    def get_matched_pairs(self, codeword1, codeword2, maximum_matches):
+        # results for older versions are kept too, so they can be used again after a rollback
+        key = (codeword1, codeword2, maximum_matches, self.candidate_versions[codeword1], self.candidate_versions[codeword2])
+        matched_pairs = self.matched_pairs_cache.get(key)
+        if matched_pairs is not None:
+            if stats.enabled:
+                stats.count("matched pairs cache hits")
+            return matched_pairs
+        matched_pairs = self.match_two_codewords(codeword1, codeword2, maximum_matches)
+        if len(self.matched_pairs_cache) >= self.MAXIMUM_MATCHED_PAIRS_CACHE_SIZE:
+            self.matched_pairs_cache = dict()
+        self.matched_pairs_cache[key] = matched_pairs
+        return matched_pairs
+
     def match_all_codeword_pairs(self, max_unique_pairs = 5):
         codewords_to_match = sorted(self.matched_words.keys(), key=lambda c: len(self.matched_words[c]))
         matched_pairs = dict()
@@ -491,24 +2032,68 @@ class CodewordPuzzle:
                     return matched_pairs
         return matched_pairs
     
+    def match_codeword_pairs_in_parallel(self, codeword_pairs, maximum_matches):
+        # pairs not in matched_pairs_cache are matched in worker processes and added to the cache,
+        # the workers use letter masks and not the NumPy engine, which stays in this process
+        keys = [(codeword1, codeword2, maximum_matches, self.candidate_versions[codeword1], self.candidate_versions[codeword2]) for codeword1, codeword2 in codeword_pairs]
+        pairs_to_match = [codeword_pair for codeword_pair, key in zip(codeword_pairs, keys) if key not in self.matched_pairs_cache]
+        if len(pairs_to_match) < self.MINIMUM_PARALLEL_PAIRS:
+            return
+        codewords_to_match = {codeword for codeword_pair in pairs_to_match for codeword in codeword_pair}
+        changed_codewords = {codeword for codeword in codewords_to_match if self.pair_executor_versions.get(codeword) != self.candidate_versions[codeword]}
+        # otherwise the changed lists are sent with the chunks that need them
+        if self.pair_executor is None or len(changed_codewords) > self.PAIR_WORKERS_RESTART_SHARE * len(self.matched_words_all):
+            self.start_pair_workers()
+            changed_codewords = set()
+        chunk_size = -(-len(pairs_to_match) // (self.workers * self.CHUNKS_PER_WORKER))
+        chunks = [pairs_to_match[i:i + chunk_size] for i in range(0, len(pairs_to_match), chunk_size)]
+        changed_matched_words_of_chunks = []
+        for chunk in chunks:
+            changed_matched_words = dict()
+            for codeword_pair in chunk:
+                for codeword in codeword_pair:
+                    if codeword in changed_codewords and codeword not in changed_matched_words:
+                        changed_matched_words[codeword] = (self.matched_words[codeword], self.get_letter_masks(codeword))
+            changed_matched_words_of_chunks.append(changed_matched_words)
+        results = self.pair_executor.map(match_codeword_pairs_in_worker, chunks, [maximum_matches] * len(chunks), changed_matched_words_of_chunks)
+        matched_pairs_in_order = [matched_pairs for chunk_results in results for matched_pairs in chunk_results]
+        if len(self.matched_pairs_cache) + len(pairs_to_match) > self.MAXIMUM_MATCHED_PAIRS_CACHE_SIZE:
+            self.matched_pairs_cache = dict()
+        for (codeword1, codeword2), matched_pairs in zip(pairs_to_match, matched_pairs_in_order):
+            self.matched_pairs_cache[(codeword1, codeword2, maximum_matches, self.candidate_versions[codeword1], self.candidate_versions[codeword2])] = matched_pairs
+
+    def start_pair_workers(self):
+        # the workers get the candidate lists of every codeword once, when the pool starts
+        self.close_pair_workers()
+        matched_words = dict()
+        for codeword, words in self.matched_words.items():
+            matched_words[codeword] = (words, self.get_letter_masks(codeword))
+            self.pair_executor_versions[codeword] = self.candidate_versions[codeword]
+        self.pair_executor = ProcessPoolExecutor(self.workers, initializer=initialize_pair_worker, initargs=(matched_words,))
+
+    def close_pair_workers(self):
+        if self.pair_executor is not None:
+            self.pair_executor.shutdown()
+            self.pair_executor = None
+        self.pair_executor_versions = dict()
+
+    @timed("find_all_unique_pairs")
     def find_all_unique_pairs(self):
         unique_pairs = []
         codewords_to_match = sorted(self.matched_words.keys(), key=lambda c: len(self.matched_words[c]))
-        # print("codewords sorted")
-        # checked_things = 0
-        # good_things = 0
+        codeword_pairs = []
         for i, codeword1 in enumerate(codewords_to_match):
             is_codeword1_solved = self.is_codeword_solved(codeword1)
             for codeword2 in codewords_to_match[i + 1:]:
-                # checked_things += 1
-                is_codeword2_solved = self.is_codeword_solved(codeword2)
-                if is_codeword1_solved and is_codeword2_solved:
+                if is_codeword1_solved and self.is_codeword_solved(codeword2):
                     continue
-                matched_pairs = self.match_two_codewords(codeword1, codeword2, 1)
-                if matched_pairs:
-                    # good_things += 1
-                    # print(f"{checked_things} pair is good number {good_things}")
-                    unique_pairs.append(((codeword1, codeword2), matched_pairs[0]))
+                codeword_pairs.append((codeword1, codeword2))
+        if self.workers > 1:
+            self.match_codeword_pairs_in_parallel(codeword_pairs, 1)
+        for codeword1, codeword2 in codeword_pairs:
+            matched_pairs = self.get_matched_pairs(codeword1, codeword2, 1)
+            if matched_pairs:
+                unique_pairs.append(((codeword1, codeword2), matched_pairs[0]))
         return unique_pairs
 
     def find_a_unique_pair(self, sorted_codewords):
@@ -518,7 +2103,7 @@ class CodewordPuzzle:
             for codeword2 in sorted_codewords[i + 1:]:
                 if is_solved1 and self.is_codeword_solved(codeword2):
                     continue
-                matched_pairs = self.match_two_codewords(codeword1, codeword2, maximum_num_of_pairs)
+                matched_pairs = self.get_matched_pairs(codeword1, codeword2, maximum_num_of_pairs)
                 if len(matched_pairs) == maximum_num_of_pairs:
                     return (codeword1, codeword2), matched_pairs[0]
 
@@ -528,7 +2113,7 @@ class CodewordPuzzle:
         pairs_left = set()
         for i, codeword1 in enumerate(codewords_to_match):
             for codeword2 in codewords_to_match[i + 1:]:
-                matched_pairs = self.match_two_codewords(codeword1, codeword2, maximum_num_of_pairs)
+                matched_pairs = self.get_matched_pairs(codeword1, codeword2, maximum_num_of_pairs)
                 if len(matched_pairs) == maximum_num_of_pairs:
                     yield (codeword1, codeword2), matched_pairs[0]
                 else:
@@ -538,7 +2123,7 @@ class CodewordPuzzle:
         while pairs_left:
             pairs_still_left = set()
             for codeword1, codeword2 in pairs_left:
-                matched_pairs = self.match_two_codewords(codeword1, codeword2, maximum_num_of_pairs)
+                matched_pairs = self.get_matched_pairs(codeword1, codeword2, maximum_num_of_pairs)
                 if len(matched_pairs) == maximum_num_of_pairs:
                     
                     for pair in matched_pairs:
@@ -549,35 +2134,36 @@ class CodewordPuzzle:
             maximum_num_of_pairs += 1
             
                 
-    def try_more_words(self, codewords, matched_codewords, substitution_tuple, minimum_matches_wanted):
+    def try_more_words(self, codewords, matched_codewords, substitution, minimum_matches_wanted):
+        if stats.enabled:
+            stats.count("try_more_words calls")
         if not codewords:
-            return matched_codewords, substitution_tuple
+            return matched_codewords, substitution
         for i, codeword in enumerate(codewords):
             for word in self.matched_words[codeword]:
-                if not does_word_match_to_substitution_tuple(word, codeword, substitution_tuple):
+                if not does_word_match_to_substitution(word, codeword, substitution):
                     continue
                 new_matched_codewords = tuple([*matched_codewords, codeword])
-                words = tuple([word for _, word in decrypt_codewords(matched_codewords, substitution_tuple)])
-                new_substitution_tuple = get_substitution_tuple(new_matched_codewords, [*words, word])
-                new_matched_codewords, new_substitution_tuple = self.try_more_words(codewords[i + 1:], new_matched_codewords, new_substitution_tuple, minimum_matches_wanted)
+                new_substitution = substitution.with_word(codeword, word)
+                new_matched_codewords, new_substitution = self.try_more_words(codewords[i + 1:], new_matched_codewords, new_substitution, minimum_matches_wanted)
                 if len(new_matched_codewords) >= minimum_matches_wanted:
-                    return new_matched_codewords, new_substitution_tuple
-        return matched_codewords, substitution_tuple
+                    return new_matched_codewords, new_substitution
+        return matched_codewords, substitution
 
     def start_matching_words(self, minimum_matches_wanted):
         for codeword_pair, word_pair in self.find_pairs():
             # TODO: is this information useful?
             # print("Trying with pair:")
             # print(codeword_pair, word_pair)
-            substitution_tuple = get_substitution_tuple(codeword_pair, word_pair)
-            for num, char in substitution_tuple:
+            substitution = Substitution(self.alphabet, get_substitution_tuple(codeword_pair, word_pair))
+            for num, char in substitution:
                 self.add_to_substitution_dict(num, char)
-            self.set_matched_words()
+            self.rematch_words()
             codewords = [codeword for codeword in self.matched_words.keys() if codeword not in codeword_pair]
             codewords = sorted(codewords, key=lambda c: len(self.matched_words[c]))
-            matched_codewords, substitution_tuple = self.try_more_words(codewords, codeword_pair, substitution_tuple, minimum_matches_wanted)
+            matched_codewords, substitution = self.try_more_words(codewords, codeword_pair, substitution, minimum_matches_wanted)
             if len(matched_codewords) >= minimum_matches_wanted:
-                return matched_codewords, substitution_tuple
+                return matched_codewords, substitution
     
     def try_to_solve_by_guessing(self):
         codewords_to_match = sorted(self.matched_words.keys(), key=lambda c: len(self.matched_words[c]))
@@ -593,6 +2179,9 @@ class CodewordPuzzle:
         return guesses
             
     def try_to_solve_using_unique_pairs(self):
+        # stops when the letters do not go around, then no more words can be found from pairs
+        if not self.propagate_letter_domains():
+            return
         unique_pairs = self.find_all_unique_pairs()
         while unique_pairs:
             # choose the (new) codeword-word that appears the most
@@ -617,12 +2206,235 @@ class CodewordPuzzle:
             for num, char in zip(codeword, [c for c in word]):
                 self.add_to_substitution_dict(num, char, override=True)
             # self.set_matched_words()
+            if not self.propagate_letter_domains():
+                return
             unique_pairs = self.find_all_unique_pairs()
 
+    def get_letter_bit(self, char):
+        letter_index = self.letter_indices.get(char)
+        if letter_index is None:
+            letter_index = len(self.letters)
+            self.letters.append(char)
+            self.letter_indices[char] = letter_index
+        return 1 << letter_index
+
+    def get_letter_domains(self):
+        # letter_domains[num] has the letters that the candidates of every codeword with num allow for num
+        letter_domains = dict()
+        for codeword in self.get_codewords_with_candidates():
+            bitset = self.matched_bitsets[codeword]
+            length = len(codeword)
+            for position, num in enumerate(codeword):
+                if self.substitution_dict[num]:
+                    continue
+                letter_domain = 0
+                for char in self.wordlist_index.get_position_letters(length, position):
+                    if bitset & self.wordlist_index.get_position_letter_bitset(length, position, char):
+                        letter_domain |= self.get_letter_bit(char)
+                letter_domains[num] = letter_domains.get(num, letter_domain) & letter_domain
+        return letter_domains
+
+    @timed("propagate_letter_domains")
+    def propagate_letter_domains(self):
+        # the numbers must all get different letters: letters that are needed elsewhere are taken away
+        # from the candidates, and again after the candidates have changed,
+        # returns False if there are no letters to go around
+        while True:
+            letter_domains = prune_letter_domains(self.get_letter_domains())
+            if letter_domains is None:
+                return False
+            is_changed = False
+            for codeword in self.get_codewords_with_candidates():
+                bitset = self.matched_bitsets[codeword]
+                length = len(codeword)
+                for position, num in enumerate(codeword):
+                    letter_domain = letter_domains.get(num)
+                    if letter_domain is None:
+                        continue
+                    position_bitset = 0
+                    for letter in get_bits(letter_domain):
+                        position_bitset |= self.wordlist_index.get_position_letter_bitset(length, position, self.letters[letter.bit_length() - 1])
+                    bitset &= position_bitset
+                if self.set_candidates(codeword, bitset):
+                    is_changed = True
+                if not bitset:
+                    return False
+            if not is_changed:
+                return True
+
+    def get_codewords_with_candidates(self):
+        return [codeword for codeword, bitset in self.matched_bitsets_all.items() if bitset]
+
+    def get_neighbouring_codewords(self, codeword):
+        # codewords with candidates that share at least one number with codeword
+        neighbouring_codewords = self.neighbouring_codewords.get(codeword)
+        if neighbouring_codewords is None:
+            neighbouring_codewords = []
+            for num in set(codeword):
+                for other_codeword in self.codewords_by_num[num]:
+                    if other_codeword != codeword and other_codeword not in neighbouring_codewords and self.matched_bitsets_all[other_codeword]:
+                        neighbouring_codewords.append(other_codeword)
+            self.neighbouring_codewords[codeword] = neighbouring_codewords
+        return neighbouring_codewords
+
+    def revise_candidates(self, codeword1, codeword2):
+        if stats.enabled:
+            stats.count("arc revisions")
+        # keeps the candidates of codeword1 that fit together with at least one candidate of codeword2
+        matching_indices, others1, others2 = get_matching_indices(codeword1, codeword2)
+        num_of_shared_letters = len(matching_indices)
+        words2 = self.matched_words[codeword2]
+        letter_masks2_by_key = group_words_by_indices(words2, [index2 for _, index2 in matching_indices], self.get_letter_masks(codeword2))
+        indices1 = [index1 for index1, _ in matching_indices]
+        get_key = itemgetter(*indices1) if indices1 else lambda word: ""
+        word_ids = get_word_ids_from_bitset(self.matched_bitsets[codeword1])
+        supported_word_ids = []
+        supported_words = []
+        for word_id, word1, letter_mask1 in zip(word_ids, self.matched_words[codeword1], self.get_letter_masks(codeword1)):
+            for letter_mask2 in letter_masks2_by_key.get(get_key(word1), ()):
+                if (letter_mask1 & letter_mask2).bit_count() == num_of_shared_letters:
+                    supported_word_ids.append(word_id)
+                    supported_words.append(word1)
+                    break
+        if len(supported_word_ids) == len(word_ids):
+            return False
+        self.set_candidates(codeword1, get_bitset_from_word_ids(supported_word_ids), supported_words)
+        return True
+
+    @timed("propagate_constraints")
+    def propagate_constraints(self):
+        # AC-3: codewords sharing numbers constrain each other's candidates until nothing more can be removed,
+        # returns False if some codeword runs out of candidates
+        if not self.propagate_letter_domains():
+            return False
+        codewords = self.get_codewords_with_candidates()
+        if not all(self.matched_bitsets[codeword] for codeword in codewords):
+            return False
+        arcs = deque((codeword1, codeword2) for codeword1 in codewords for codeword2 in self.get_neighbouring_codewords(codeword1))
+        arcs_in_queue = set(arcs)
+        while arcs:
+            arc = arcs.popleft()
+            arcs_in_queue.discard(arc)
+            codeword1, codeword2 = arc
+            if not self.revise_candidates(codeword1, codeword2):
+                continue
+            if not self.matched_bitsets[codeword1]:
+                return False
+            for codeword3 in self.get_neighbouring_codewords(codeword1):
+                if codeword3 != codeword2 and (codeword3, codeword1) not in arcs_in_queue:
+                    arcs.append((codeword3, codeword1))
+                    arcs_in_queue.add((codeword3, codeword1))
+        return True
+
+    def try_to_solve_by_propagation(self):
+        # codewords left with only one candidate are solved and the propagation starts again
+        while self.propagate_constraints():
+            solved_codewords = []
+            for codeword in self.get_codewords_with_candidates():
+                words = self.matched_words[codeword]
+                if len(words) == 1 and not self.is_codeword_solved(codeword):
+                    solved_codewords.append((codeword, words[0]))
+            if not solved_codewords:
+                return
+            for codeword, word in solved_codewords:
+                if self.is_codeword_solved(codeword):
+                    continue
+                for num, char in zip(codeword, word):
+                    self.add_to_substitution_dict(num, char, override=True)
+                if not self.is_codeword_solved(codeword):
+                    return
+                yield codeword, word
+    
+    def get_solving_stats(self):
+        solved_codewords = 0
+        found_words = 0
+        for codeword in self.codewords:
+            if self.is_codeword_solved(codeword):
+                solved_codewords += 1
+            word = self.get_decrypted_codeword(codeword)
+            if word in self.matched_words_all[codeword]:
+                found_words += 1
+        return {
+            "solved_codewords": solved_codewords,
+            "codewords": len(self.codewords),
+            "found_words_in_wordlist": found_words,
+            "solved_numbers": len([char for char in self.substitution_dict.values() if char]),
+            "numbers": len(self.substitution_dict)
+        }
+
+    def is_solution_valid(self, codewords):
+        # every codeword with candidates decrypts to one of its words and no letter is used twice
+        used_chars = [char for char in self.substitution_dict.values() if char]
+        if len(used_chars) != len(set(used_chars)):
+            return False
+        for codeword in codewords:
+            if self.get_decrypted_codeword(codeword) not in self.matched_words_all[codeword]:
+                return False
+        return True
+
+    def search_codewords(self, codewords, maximum_steps):
+        # branch on the unsolved codeword with the fewest candidates
+        the_codeword = None
+        least_matches = None
+        for codeword in codewords:
+            number_of_matches = self.get_number_of_matches(codeword)
+            if not number_of_matches:
+                return False
+            if not self.unsolved_nums_counts[codeword]:
+                continue
+            if least_matches is None or number_of_matches < least_matches:
+                the_codeword = codeword
+                least_matches = number_of_matches
+        if the_codeword is None:
+            return True
+        for word in self.matched_words[the_codeword]:
+            if maximum_steps is not None and self.search_steps >= maximum_steps:
+                return False
+            self.search_steps += 1
+            if stats.enabled:
+                stats.count("search branches")
+            self.push_checkpoint()
+            for num, char in zip(the_codeword, word):
+                self.add_to_substitution_dict(num, char)
+            # forward checking: the candidates of the other codewords were narrowed down by the new letters
+            if self.is_codeword_solved(the_codeword) and all(self.matched_bitsets[codeword] for codeword in codewords) and self.search_codewords(codewords, maximum_steps):
+                return True
+            self.rollback()
+        return False
+
+    @timed("search_for_solution")
+    def search_for_solution(self, maximum_steps=None):
+        # depth-first search through the candidates, returns True if all codewords with candidates
+        # are solved, otherwise the substitutions are left as they were
+        codewords = self.get_codewords_with_candidates()
+        redoable_changes = self.redoable_changes
+        number_of_checkpoints = len(self.checkpoints)
+        trail_length = len(self.trail)
+        self.push_checkpoint()
+        self.search_steps = 0
+        solved = self.search_codewords(codewords, maximum_steps)
+        if solved and not self.is_solution_valid(codewords):
+            while len(self.checkpoints) > number_of_checkpoints:
+                self.rollback()
+            solved = False
+        # the changes of a successful search are kept under the checkpoint before the search
+        del self.checkpoints[number_of_checkpoints:]
+        if len(self.trail) == trail_length:
+            # nothing changed, so the changes that could be redone before the search still can
+            self.redoable_changes = redoable_changes
+        else:
+            # the branches that were given up are not worth redoing
+            self.redoable_changes = []
+        if not self.checkpoints:
+            # like record_change, no changes are kept without a checkpoint to roll back to
+            self.trail = []
+        return solved
     
-    def try_to_match_more_words(self, codewords, start_index, matched_codewords, substitution_tuple, minimum_matches_wanted):
+    def try_to_match_more_words(self, codewords, start_index, matched_codewords, substitution, minimum_matches_wanted):
+        if stats.enabled:
+            stats.count("try_to_match_more_words calls")
         if start_index < 1:
-            return matched_codewords, substitution_tuple
+            return matched_codewords, substitution
         # print(f"Index {start_index}")
         for i in range(start_index, -1, -1):
             current_codeword = codewords[i]
@@ -630,20 +2442,19 @@ class CodewordPuzzle:
                 continue
             for word in self.matched_words[current_codeword]:
                 if matched_codewords is None:
-                    substitution_tuple = get_substitution_tuple([current_codeword], [word])
-                    new_matched_codewords, new_substitution_tuple = self.try_to_match_more_words(codewords, i - 1, tuple([current_codeword]), substitution_tuple, minimum_matches_wanted)
+                    substitution = Substitution(self.alphabet).with_word(current_codeword, word)
+                    new_matched_codewords, new_substitution = self.try_to_match_more_words(codewords, i - 1, tuple([current_codeword]), substitution, minimum_matches_wanted)
                     if len(new_matched_codewords) >= minimum_matches_wanted:
-                        return new_matched_codewords, new_substitution_tuple
+                        return new_matched_codewords, new_substitution
                     continue
-                if not does_word_match_to_substitution_tuple(word, current_codeword, substitution_tuple):
+                if not does_word_match_to_substitution(word, current_codeword, substitution):
                     continue
                 new_matched_codewords = tuple([*matched_codewords, current_codeword])
-                words = tuple([w for _, w in decrypt_codewords(matched_codewords, substitution_tuple)])
-                new_substitution_tuple = get_substitution_tuple(new_matched_codewords, [*words, word])
-                new_matched_codewords, new_substitution_tuple = self.try_to_match_more_words(codewords, i - 1, new_matched_codewords, new_substitution_tuple, minimum_matches_wanted)
+                new_substitution = substitution.with_word(current_codeword, word)
+                new_matched_codewords, new_substitution = self.try_to_match_more_words(codewords, i - 1, new_matched_codewords, new_substitution, minimum_matches_wanted)
                 if len(new_matched_codewords) >= minimum_matches_wanted:
-                    return new_matched_codewords, new_substitution_tuple
-        return matched_codewords, substitution_tuple
+                    return new_matched_codewords, new_substitution
+        return matched_codewords, substitution
     
     def try_to_match_words_to_numbers(self, minimum_matches_wanted, minimum_letter_matches_wanted, num_of_iterations):
         # codewords = sorted(self.matched_words.keys(), key=lambda t: len(self.matched_words[t]), reverse=True)
@@ -704,6 +2515,86 @@ def yes_or_no_question(question_text, yes_no_tuple=("y", "n"), help_text="Please
         print(help_text)
 
 
+# wordlist index of a solve worker, loaded once when the worker starts
+solve_worker_wordlist_index = None
+
+
+def get_wordlists_for_store(wordlist_path, alphabet, use_cache, lengths=None, frequency_column=None, frequency_is_rank=False, wordlist_store=None):
+    # a WordTrie takes the word lists one length at a time, the other stores keep them all
+    if wordlist_store == WORDLIST_STORE_TRIE:
+        return iterate_compiled_wordlist(wordlist_path, alphabet, use_cache, lengths, frequency_column, frequency_is_rank)
+    return get_compiled_wordlist(wordlist_path, alphabet, use_cache, lengths, frequency_column, frequency_is_rank)
+
+
+def get_wordlist_index(wordlists, alphabet, use_numpy, wordlist_store=None):
+    # with wordlist_store "trie" the words are kept in a WordTrie instead of lists
+    if wordlist_store == WORDLIST_STORE_TRIE:
+        wordlists = WordTrie(wordlists)
+    return WordlistIndex(wordlists, alphabet, use_numpy)
+
+
+def initialize_solve_worker(wordlist_path, alphabet, use_cache, use_numpy, use_stats=False, frequency_column=None, frequency_is_rank=False, wordlist_store=None):
+    stats.enable(use_stats)
+    wordlists = get_wordlists_for_store(wordlist_path, alphabet, use_cache, None, frequency_column, frequency_is_rank, wordlist_store)
+    set_solve_worker_wordlist_index(get_wordlist_index(wordlists, alphabet, use_numpy, wordlist_store))
+
+
+def set_solve_worker_wordlist_index(wordlist_index):
+    global solve_worker_wordlist_index
+    solve_worker_wordlist_index = wordlist_index
+
+
+def solve_codeword_file(codeword_path, alphabet, maximum_search_steps, wordlist_index=None):
+    if wordlist_index is None:
+        wordlist_index = solve_worker_wordlist_index
+    comments, codewords = get_codewords(codeword_path)
+    record = {"file": str(codeword_path)}
+    record.update(solve_codewords(codewords, comments, alphabet, maximum_search_steps, wordlist_index))
+    return record
+
+
+def get_puzzle_with_substitution(codewords, comments, alphabet, wordlist_index, substitution=()):
+    # substitution as (num, char) pairs, raises ValueError if some of them cannot be set
+    puzzle = CodewordPuzzle(codewords, None, alphabet, comments, wordlist_index)
+    for num, char in substitution:
+        if puzzle.add_to_substitution_dict(num, char.lower()):
+            raise ValueError(f"cannot set {num} as {char}")
+    return puzzle
+
+
+def solve_codewords(codewords, comments, alphabet, maximum_search_steps, wordlist_index, substitution=()):
+    # solves the puzzle without asking anything: unique pairs first, then search for the rest
+    timings = dict()
+    start_time = time.perf_counter()
+    puzzle = get_puzzle_with_substitution(codewords, comments, alphabet, wordlist_index, substitution)
+    timings["matching"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for _ in puzzle.try_to_solve_using_unique_pairs():
+        pass
+    timings["unique_pairs"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    if puzzle.get_solving_stats()["solved_codewords"] < len(codewords):
+        puzzle.search_for_solution(maximum_search_steps)
+    timings["search"] = time.perf_counter() - start_time
+
+    record = {
+        "substitution": {num: char for num, char in sorted(puzzle.substitution_dict.items())},
+        "words": [puzzle.get_decrypted_codeword(codeword) for codeword in codewords],
+        "timings": timings,
+        "stats": puzzle.get_solving_stats()
+    }
+    if stats.enabled:
+        record["instrumentation"] = stats.get_dict()
+        stats.reset()
+    return record
+
+
+def solve_codeword_file_in_worker(codeword_path, alphabet, maximum_search_steps):
+    return solve_codeword_file(codeword_path, alphabet, maximum_search_steps)
+
+
 class Krypto:
     DEFAULT_LANGUAGE_FILE_PATH = "language_file"
     DEFAULT_CONFIG_PATH = "krypto.conf"
@@ -711,8 +2602,15 @@ class Krypto:
     ALPHABET_KEY = "alphabet"
     WORDLIST_PATH_KEY = "wordlist_path"
     CODEWORD_FOLDER_PATH_KEY = "codeword_folder_path"
+    WORKERS_KEY = "workers"
+    FREQUENCY_COLUMN_KEY = "frequency_column"
+    FREQUENCY_IS_RANK_KEY = "frequency_is_rank"
+    WORDLIST_STORE_KEY = "wordlist_store"
 
     SOLUTION_SUCCESS_THRESHOLD = 0.75
+    MAXIMUM_SEARCH_STEPS = 1_000_000
+    USE_WORDLIST_CACHE = True
+    USE_NUMPY_ENGINE = True
 
     def __init__(self, language_file_path=DEFAULT_LANGUAGE_FILE_PATH, config_path=DEFAULT_CONFIG_PATH, language=None, wordlist_path=None, codeword_path=None, puzzle=None):
         self.language_dict = get_language_dict(language_file_path)
@@ -799,29 +2697,68 @@ class Krypto:
     def get_command_line_arguments(self):
         language = None
         codeword_path = None
-        for arg in sys.argv[1:]:
+        session_path = None
+        args = sys.argv[1:]
+        for i, arg in enumerate(args):
+            if arg == "--resume":
+                continue
+            if i > 0 and args[i - 1] == "--resume":
+                session_path = Path(arg)
+                continue
             if arg in self.config.keys():
                 language = arg
                 continue
             if possible_codeword_path := get_codeword_path(arg, self.config[self.language][self.CODEWORD_FOLDER_PATH_KEY]):
                 codeword_path = possible_codeword_path
                 continue
-        return language, codeword_path
+        return language, codeword_path, session_path
+
+
+    def get_frequency_settings(self, language=None):
+        if language is None:
+            language = self.language
+        frequency_column = self.config[language].get(self.FREQUENCY_COLUMN_KEY)
+        frequency_is_rank = self.config[language].get(self.FREQUENCY_IS_RANK_KEY) in ("yes", "true", "1")
+        return (int(frequency_column) if frequency_column else None), frequency_is_rank
 
+    def get_compiled_wordlist(self, wordlist_path=None, lengths=None):
+        if wordlist_path is None:
+            wordlist_path = self.wordlist_path
+        alphabet = self.config[self.language][self.ALPHABET_KEY]
+        return get_compiled_wordlist(wordlist_path, alphabet, self.USE_WORDLIST_CACHE, lengths, *self.get_frequency_settings())
 
-    def initialize_puzzle(self, codeword_path, wordlist_path=None):
+    def load_wordlist_index(self, language=None):
+        # the whole wordlist of the language, with every length indexed right away
+        if language is None:
+            language = self.language
+        wordlist_path = self.wordlist_path if language == self.language else self.config[language][self.WORDLIST_PATH_KEY]
+        alphabet = self.config[language][self.ALPHABET_KEY]
+        wordlists = get_wordlists_for_store(wordlist_path, alphabet, self.USE_WORDLIST_CACHE, None, *self.get_frequency_settings(language), self.config[language].get(self.WORDLIST_STORE_KEY))
+        wordlist_index = get_wordlist_index(wordlists, alphabet, self.USE_NUMPY_ENGINE, self.config[language].get(self.WORDLIST_STORE_KEY))
+        wordlist_index.build()
+        return wordlist_index
+
+    def initialize_puzzle(self, codeword_path, wordlist_path=None, initial_candidates=None):
+        # initial_candidates of a saved session skip the initial matching
         self.codeword_path = codeword_path
         comments, codewords = get_codewords(codeword_path)
         # config = read_config(config_path)[language_tag.lower()]
         alphabet = self.config[self.language][self.ALPHABET_KEY]
         if wordlist_path is None:
             self.wordlist_path = self.config[self.language][self.WORDLIST_PATH_KEY]
-            wordlist = get_wordlist(self.wordlist_path)
-        else:
-            wordlist = get_wordlist(wordlist_path)
+            wordlist_path = self.wordlist_path
+        if self.puzzle is not None:
+            self.puzzle.close_pair_workers()
+            self.puzzle.wordlist_index.close()
+        # only the lengths of the codewords are needed
+        wordlists = get_wordlists_for_store(wordlist_path, alphabet, self.USE_WORDLIST_CACHE, {len(codeword) for codeword in codewords}, *self.get_frequency_settings(), self.config[self.language].get(self.WORDLIST_STORE_KEY))
         # print(self.language, self.wordlist_path)
-        wordlist = [word for word in wordlist if are_letters_in_alphabet(word, alphabet)]
-        self.puzzle = CodewordPuzzle(codewords, wordlist, alphabet, comments)
+        wordlist_index = get_wordlist_index(wordlists, alphabet, self.USE_NUMPY_ENGINE, self.config[self.language].get(self.WORDLIST_STORE_KEY))
+        workers = int(self.config[self.language].get(self.WORKERS_KEY) or 1)
+        candidate_bitsets = None
+        if initial_candidates is not None:
+            candidate_bitsets = {codeword: int(bitset_hex, 16) for codeword, bitset_hex in zip(codewords, initial_candidates)}
+        self.puzzle = CodewordPuzzle(codewords, None, alphabet, comments, wordlist_index, workers, candidate_bitsets)
         
         for codeword in self.puzzle.codewords:
             if len(codeword) > self.max_word_length:
@@ -857,6 +2794,7 @@ class Krypto:
         except ValueError:
             nums = [int(num.strip()) for num in num_input.split(",")]
             chars = [c.strip() for c in char.split(",")]
+        self.puzzle.push_checkpoint()
         for num, char in zip(nums, chars):
             issue = self.puzzle.add_to_substitution_dict(num, char.lower(), issues)
             if not issues:
@@ -907,9 +2845,10 @@ class Krypto:
             word_not_in_wordlist_text = mass_replace(self.current_language_dict["word_not_in_wordlist_text"], word)
             print(word_not_in_wordlist_text)
             # print(f"{word} is NOT in wordlist")
+        self.puzzle.push_checkpoint()
         for num, char in zip(codeword, [c for c in word]):
             self.puzzle.add_to_substitution_dict(num, char, override=True)
-        self.puzzle.set_matched_words()
+        self.puzzle.rematch_words()
 
     def print_pairs(self, codeword_pair, word_pair, max_codeword_length=None, max_word_length=None, solved_char="*"):
         codeword1, codeword2 = codeword_pair
@@ -961,22 +2900,18 @@ class Krypto:
         solving_time_text = mass_replace(self.current_language_dict["solving_time_with_steps_text"], round(elapsed_time, 3))
         print(solving_time_text)
         
-        num_of_solved_codewords = 0
-        num_of_found_words = 0
-        for codeword in self.puzzle.codewords:
-            if self.puzzle.is_codeword_solved(codeword):
-                num_of_solved_codewords += 1
-            word = self.puzzle.get_decrypted_codeword(codeword)
-            if word in self.puzzle.matched_words_all[codeword]:
-                num_of_found_words += 1
-        found_codewords_text = mass_replace(self.current_language_dict["found_codewords_text"], num_of_solved_codewords, len(self.puzzle.codewords))
+        solving_stats = self.puzzle.get_solving_stats()
+        found_codewords_text = mass_replace(self.current_language_dict["found_codewords_text"], solving_stats["solved_codewords"], solving_stats["codewords"])
         print(found_codewords_text)
-        found_codewords_in_wordlist_text = mass_replace(self.current_language_dict["found_codewords_in_wordlist_text"], num_of_found_words)
+        found_codewords_in_wordlist_text = mass_replace(self.current_language_dict["found_codewords_in_wordlist_text"], solving_stats["found_words_in_wordlist"])
         print(found_codewords_in_wordlist_text)
 
-        num_of_solved_numbers = len([value for value in self.puzzle.substitution_dict.values() if value])
-        substitution_table_decipher_text = mass_replace(self.current_language_dict["substitution_table_decipher_text"], num_of_solved_numbers, len(self.puzzle.substitution_dict))
+        substitution_table_decipher_text = mass_replace(self.current_language_dict["substitution_table_decipher_text"], solving_stats["solved_numbers"], solving_stats["numbers"])
         print(substitution_table_decipher_text)
+        if stats.enabled:
+            print()
+            stats.print_table()
+            stats.reset()
 
     def try_to_solve_puzzle(self, minimum_matches_wanted=None):
     # def try_to_solve_puzzle(self, minimum_matches_wanted, minimum_letter_matches_wanted, num_of_iterations):
@@ -984,6 +2919,7 @@ class Krypto:
         if minimum_matches_wanted is None:
             # TODO: what is a good default here?
             minimum_matches_wanted = len(self.puzzle.codewords) // 5
+        self.puzzle.push_checkpoint()
         start_time = time.time()
         solved_codewords, substitution_tuple = self.puzzle.start_matching_words(minimum_matches_wanted)
         end_time = time.time()
@@ -1012,16 +2948,44 @@ class Krypto:
     def try_to_solve_puzzle_methodically(self, start_time=None):
         if start_time is None:
             start_time = time.time()
+        self.puzzle.push_checkpoint()
         found_words = 0
         for codeword, word in self.puzzle.try_to_solve_using_unique_pairs():
             found_words += 1
-            codeword_str = codeword_as_str(codeword)
-            part1 = f"{add_whitespace(str(self.puzzle.codewords.index(codeword) + 1), 4)} {add_whitespace(codeword_str, self.max_codeword_length)}"
-            part2 = f"{add_whitespace(word.upper(), self.max_word_length)}"
-            print(f"{add_whitespace(str(found_words), self.max_num_size)} {self.current_language_dict["best_match_text"]}{part1}  {part2}")
+            self.print_found_word(found_words, codeword, word)
         end_time = time.time()
         self.print_solving_stats(end_time - start_time)
 
+    def try_to_solve_puzzle_by_propagation(self):
+        start_time = time.time()
+        self.puzzle.push_checkpoint()
+        found_words = 0
+        for codeword, word in self.puzzle.try_to_solve_by_propagation():
+            found_words += 1
+            self.print_found_word(found_words, codeword, word)
+        end_time = time.time()
+        self.print_solving_stats(end_time - start_time)
+
+    def try_to_solve_puzzle_by_search(self):
+        start_time = time.time()
+        self.puzzle.push_checkpoint()
+        if self.puzzle.search_for_solution(self.MAXIMUM_SEARCH_STEPS):
+            found_words = 0
+            for codeword in self.puzzle.codewords:
+                if self.puzzle.matched_words_all[codeword]:
+                    found_words += 1
+                    self.print_found_word(found_words, codeword, self.puzzle.get_decrypted_codeword(codeword))
+        else:
+            print(self.current_language_dict["search_fail_text"])
+        end_time = time.time()
+        self.print_solving_stats(end_time - start_time)
+
+    def print_found_word(self, found_words, codeword, word):
+        codeword_str = codeword_as_str(codeword)
+        part1 = f"{add_whitespace(str(self.puzzle.codewords.index(codeword) + 1), 4)} {add_whitespace(codeword_str, self.max_codeword_length)}"
+        part2 = f"{add_whitespace(word.upper(), self.max_word_length)}"
+        print(f"{add_whitespace(str(found_words), self.max_num_size)} {self.current_language_dict["best_match_text"]}{part1}  {part2}")
+
     
     def try_to_solve_puzzle_with_steps(self):
         # max_codeword_length = 0
@@ -1047,7 +3011,7 @@ class Krypto:
         # self.print_solving_stats(end_time - start_time)
 
         # try to guess first
-        original_substitution_dict = self.puzzle.substitution_dict.copy()
+        self.puzzle.push_checkpoint()
         print(self.current_language_dict["guessing_text"])
         start_time = time.time()
         guesses = self.puzzle.try_to_solve_by_guessing()
@@ -1062,8 +3026,7 @@ class Krypto:
             return
         
         print(self.current_language_dict["guessing_fail_text"])
-        self.puzzle.substitution_dict = original_substitution_dict.copy()
-        self.puzzle.set_matched_words()
+        self.puzzle.rollback()
         self.try_to_solve_puzzle_methodically(start_time)
 
         # guess the first pair and then go on
@@ -1102,6 +3065,75 @@ class Krypto:
         #     start_time = time.time()
             
             
+    def restart(self):
+        self.puzzle.push_checkpoint()
+        self.puzzle.clear_substitution_dict()
+
+    def undo(self):
+        # skip over actions that did not change anything
+        while (num_of_changes := self.puzzle.rollback()) is not None:
+            if num_of_changes:
+                return
+        print(self.current_language_dict["nothing_to_undo_text"])
+
+    def redo(self):
+        while (num_of_changes := self.puzzle.redo()) is not None:
+            if num_of_changes:
+                return
+        print(self.current_language_dict["nothing_to_redo_text"])
+
+    def get_wordlist_fingerprint(self, wordlist_path=None):
+        # word ids depend on the words and their order, so the wordlist store is part of it too
+        if wordlist_path is None:
+            wordlist_path = self.wordlist_path
+        alphabet = self.config[self.language][self.ALPHABET_KEY]
+        fingerprint = get_wordlist_fingerprint(wordlist_path, alphabet, *self.get_frequency_settings())
+        return [*fingerprint, self.config[self.language].get(self.WORDLIST_STORE_KEY)]
+
+    def save_session(self, session_path=None):
+        if session_path is None:
+            session_path = get_session_path(self.codeword_path)
+        session = {
+            "version": SESSION_FORMAT_VERSION,
+            "language": self.language,
+            "codeword_path": str(Path(self.codeword_path).resolve()),
+            "codeword_file_hash": get_file_hash(self.codeword_path),
+            "wordlist_path": str(Path(self.wordlist_path).resolve()),
+            "wordlist_fingerprint": self.get_wordlist_fingerprint()
+        }
+        session.update(self.puzzle.get_session())
+        write_session(session_path, session)
+        print(mass_replace(self.current_language_dict["session_saved_text"], session_path))
+        return session_path
+
+    def resume_session(self, session_path):
+        # returns False if the session cannot be read, its wordlist is missing
+        # or the puzzle file is not the same as when the session was saved
+        try:
+            session = read_session(session_path)
+            if session["language"] in self.config:
+                self.set_language(session["language"])
+            codeword_path = Path(session["codeword_path"])
+            if not codeword_path.is_file() or get_file_hash(codeword_path) != session["codeword_file_hash"]:
+                print(mass_replace(self.current_language_dict["session_puzzle_changed_text"], codeword_path))
+                return False
+            wordlist_path = session["wordlist_path"]
+            wordlist_fingerprint = self.get_wordlist_fingerprint(wordlist_path)
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            print(mass_replace(self.current_language_dict["session_not_loaded_text"], session_path, error))
+            return False
+        if wordlist_fingerprint == session["wordlist_fingerprint"]:
+            self.initialize_puzzle(codeword_path, wordlist_path, session["initial_candidates"])
+            self.puzzle.restore_session(session)
+            return True
+        # the word ids of the session do not fit this wordlist, so only the letters are kept
+        print(self.current_language_dict["session_wordlist_changed_text"])
+        self.initialize_puzzle(codeword_path, wordlist_path)
+        for num, char in session["substitution"].items():
+            self.puzzle.add_to_substitution_dict(int(num), char, override=True)
+        self.puzzle.rematch_words()
+        return True
+
     def print_substitution_dict(self):
         nums = sorted(self.puzzle.substitution_dict.keys())
         nums_as_str = [str(num) for num in nums]
@@ -1117,6 +3149,65 @@ class Krypto:
         second_line = " | ".join(values)
         print(second_line)
 
+    def get_codeword_paths(self, path_strs):
+        # folders are searched for csv files, the codeword folder of the language if nothing is given
+        codeword_folder_path = self.config[self.language][self.CODEWORD_FOLDER_PATH_KEY]
+        if not path_strs:
+            return sorted(get_csv_files_in_folder(codeword_folder_path))
+        codeword_paths = []
+        for path_str in path_strs:
+            if Path(path_str).is_dir():
+                codeword_paths.extend(sorted(get_csv_files_in_folder(Path(path_str))))
+            elif (codeword_path := get_codeword_path(path_str)) or (codeword_path := get_codeword_path(path_str, codeword_folder_path)):
+                codeword_paths.append(codeword_path)
+            else:
+                print(mass_replace(self.current_language_dict["file_not_found_text"], path_str), file=sys.stderr)
+        return codeword_paths
+
+    def solve_codeword_files(self, codeword_paths, jobs=1, output_file=sys.stdout):
+        # writes a json line for each puzzle, in the order of codeword_paths
+        alphabet = self.config[self.language][self.ALPHABET_KEY]
+        if jobs <= 1:
+            wordlists = get_wordlists_for_store(self.wordlist_path, alphabet, self.USE_WORDLIST_CACHE, None, *self.get_frequency_settings(), self.config[self.language].get(self.WORDLIST_STORE_KEY))
+            wordlist_index = get_wordlist_index(wordlists, alphabet, self.USE_NUMPY_ENGINE, self.config[self.language].get(self.WORDLIST_STORE_KEY))
+            stats.reset()
+            for codeword_path in codeword_paths:
+                self.write_solving_record(solve_codeword_file(codeword_path, alphabet, self.MAXIMUM_SEARCH_STEPS, wordlist_index), output_file)
+            wordlist_index.close()
+            return
+        number_of_paths = len(codeword_paths)
+        if "fork" in multiprocessing.get_all_start_methods():
+            # the index is built once here and the forked workers share its memory,
+            # their counters start from zero so that the records only have their own puzzles
+            wordlist_index = self.load_wordlist_index()
+            set_solve_worker_wordlist_index(wordlist_index)
+            try:
+                with ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context("fork"), initializer=stats.reset) as executor:
+                    for record in executor.map(solve_codeword_file_in_worker, codeword_paths, [alphabet] * number_of_paths, [self.MAXIMUM_SEARCH_STEPS] * number_of_paths):
+                        self.write_solving_record(record, output_file)
+            finally:
+                set_solve_worker_wordlist_index(None)
+                wordlist_index.close()
+            return
+        # without fork (e.g. on Windows) every worker loads the index itself,
+        # the wordlist is compiled (or its cache checked) here once, so the workers only read the cache
+        self.get_compiled_wordlist()
+        initargs = (self.wordlist_path, alphabet, self.USE_WORDLIST_CACHE, self.USE_NUMPY_ENGINE, stats.enabled, *self.get_frequency_settings(), self.config[self.language].get(self.WORDLIST_STORE_KEY))
+        with ProcessPoolExecutor(jobs, initializer=initialize_solve_worker, initargs=initargs) as executor:
+            for record in executor.map(solve_codeword_file_in_worker, codeword_paths, [alphabet] * number_of_paths, [self.MAXIMUM_SEARCH_STEPS] * number_of_paths):
+                self.write_solving_record(record, output_file)
+
+    def write_solving_record(self, record, output_file):
+        record["language"] = self.language
+        if stats.enabled:
+            # the counters and timers of the puzzle are shown as a table too
+            print(record["file"], file=sys.stderr)
+            instrumentation = Stats()
+            instrumentation.add(record["instrumentation"])
+            instrumentation.print_table(sys.stderr)
+        output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output_file.flush()
+
     def print_initial_info(self):
         language_line = mass_replace(self.current_language_dict["language"], self.config[self.language]["name"])
         print(language_line)
@@ -1124,7 +3215,7 @@ class Krypto:
         codewords_line = mass_replace(self.current_language_dict["codewords_in_file"], len(self.puzzle.codewords), self.codeword_path)
         print(codewords_line)
         # print(f"{len(self.puzzle.codewords)} codewords")
-        words_line = mass_replace(self.current_language_dict["words_in_file"], len(self.puzzle.wordlist), self.wordlist_path)
+        words_line = mass_replace(self.current_language_dict["words_in_file"], len(self.puzzle.wordlist_index), self.wordlist_path)
         print(words_line)
         # print(f"{len(self.puzzle.wordlist)} words")
         if self.puzzle.comments:
@@ -1144,7 +3235,6 @@ class Krypto:
     def print_codeword_progress(self, codewords=None, not_found_symbol="_"):
         if codewords is None:
             codewords = self.puzzle.codewords
-        self.puzzle.set_matched_words()
         num_of_chars1 = 0
         num_of_chars2 = 0
         for codeword in codewords:
@@ -1225,7 +3315,12 @@ class Krypto:
             # (self.current_language_dict["solve"], self.try_to_solve_puzzle),
             (self.current_language_dict["solve_with_steps"], self.try_to_solve_puzzle_with_steps),
             (self.current_language_dict["solve_methodically"], self.try_to_solve_puzzle_methodically),
-            (self.current_language_dict["restart"], self.puzzle.clear_substitution_dict),
+            (self.current_language_dict["solve_by_propagation"], self.try_to_solve_puzzle_by_propagation),
+            (self.current_language_dict["solve_by_search"], self.try_to_solve_puzzle_by_search),
+            (self.current_language_dict["undo"], self.undo),
+            (self.current_language_dict["redo"], self.redo),
+            (self.current_language_dict["restart"], self.restart),
+            (self.current_language_dict["save_session"], self.save_session),
             # (self.current_language_dict["clear_screen"], clear_screen),
             (self.current_language_dict["exit"], exit)
         ]
@@ -1266,18 +3361,357 @@ class Krypto:
     def modify_config(self):
         pass
 
-    def save_wordlist(self):
+    def save_wordlist(self, binary_path=None):
+        if binary_path is None:
+            wordlist_path = Path(self.wordlist_path)
+            binary_path = wordlist_path.with_name(f"{wordlist_path.name}{BINARY_WORDLIST_SUFFIX}")
+        # the puzzle only has the lengths of its codewords, so the whole wordlist is compiled again
+        write_binary_wordlist(binary_path, self.get_compiled_wordlist(), self.config[self.language][self.ALPHABET_KEY])
+        return binary_path
+
+
+class KryptoRequestHandler(BaseHTTPRequestHandler):
+    # GET /languages
+    # POST /matches, /unique_pairs or /solve with a puzzle, either as json
+    # {"language": "en", "codewords": [[1, 2, 3], ...], "substitution": {"1": "a"}}
+    # or as the text of a csv file, with language and substitution (e.g. 1:a,2:b) in the query string
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/languages":
+            self.send_json({"languages": list(self.server.wordlist_indexes.keys())})
+            return
+        self.send_json({"error": f"unknown path {self.path}"}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        action = self.server.ACTIONS.get(url.path)
+        if action is None:
+            self.send_json({"error": f"unknown path {url.path}"}, 404)
+            return
+        try:
+            language, codewords, comments, substitution = self.read_puzzle_request(parse_qs(url.query))
+            start_time = time.perf_counter()
+            response = {"language": language}
+            response.update(getattr(self.server, action)(language, codewords, comments, substitution))
+            response["time"] = time.perf_counter() - start_time
+        except (KeyError, ValueError, TypeError) as error:
+            self.send_json({"error": f"{type(error).__name__}: {error}"}, 400)
+            return
+        self.send_json(response)
+
+    def read_puzzle_request(self, query):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+        if self.headers.get_content_type() == "application/json":
+            puzzle_request = json.loads(body)
+            language = puzzle_request.get("language")
+            codewords = [tuple(int(num) for num in codeword) for codeword in puzzle_request["codewords"]]
+            comments = puzzle_request.get("comments", [])
+            substitution = [(int(num), char) for num, char in puzzle_request.get("substitution", dict()).items()]
+        else:
+            language = query.get("language", [None])[0]
+            comments, codewords = get_codewords_from_lines(body.splitlines())
+            substitution = []
+            for substitution_str in query.get("substitution", []):
+                for item in substitution_str.split(","):
+                    num, char = item.split(":")
+                    substitution.append((int(num), char.strip()))
+        if language is None:
+            language = self.server.default_language
+        if language not in self.server.wordlist_indexes:
+            raise KeyError(f"language {language} is not loaded")
+        if not codewords:
+            raise ValueError("no codewords")
+        return language, codewords, comments, substitution
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class KryptoServer(ThreadingHTTPServer):
+    # every request gets its own CodewordPuzzle, the wordlist indexes are built before serving; the bitsets and word ids
+    # of each pattern (and the letters of each position) are still cached by the request threads the first time they are needed,
+    # a cache entry is only ever set to a finished value, so two threads may compute it twice but never see half of it
+    DEFAULT_HOST = "127.0.0.1"
+    DEFAULT_PORT = 8765
+    ACTIONS = {"/matches": "get_matches", "/unique_pairs": "get_unique_pairs", "/solve": "solve"}
+    daemon_threads = True
+
+    def __init__(self, server_address, krypto, languages):
+        super().__init__(server_address, KryptoRequestHandler)
+        self.krypto = krypto
+        self.wordlist_indexes = dict()
+        for language in languages:
+            self.wordlist_indexes[language] = krypto.load_wordlist_index(language)
+        self.default_language = krypto.language if krypto.language in self.wordlist_indexes else next(iter(self.wordlist_indexes), None)
+
+    def server_close(self):
+        super().server_close()
+        for wordlist_index in self.wordlist_indexes.values():
+            wordlist_index.close()
+
+    def get_puzzle(self, language, codewords, comments, substitution):
+        alphabet = self.krypto.config[language][Krypto.ALPHABET_KEY]
+        return get_puzzle_with_substitution(codewords, comments, alphabet, self.wordlist_indexes[language], substitution)
+
+    def get_matches(self, language, codewords, comments, substitution):
+        puzzle = self.get_puzzle(language, codewords, comments, substitution)
+        return {"matches": [{"codeword": list(codeword), "words": puzzle.matched_words.get(codeword, [])} for codeword in puzzle.codewords]}
+
+    def get_unique_pairs(self, language, codewords, comments, substitution):
+        puzzle = self.get_puzzle(language, codewords, comments, substitution)
+        return {"unique_pairs": [{"codewords": [list(codeword1), list(codeword2)], "words": list(word_pair)} for (codeword1, codeword2), word_pair in puzzle.find_all_unique_pairs()]}
+
+    def solve(self, language, codewords, comments, substitution):
+        alphabet = self.krypto.config[language][Krypto.ALPHABET_KEY]
+        return solve_codewords(codewords, comments, alphabet, self.krypto.MAXIMUM_SEARCH_STEPS, self.wordlist_indexes[language], substitution)
+
+
+class KryptoSession:
+    # the same operations as the interactive menu, one json object per line in and out:
+    # {"command": "set_letter", "num": 12, "char": "a"} -> {"command": "set_letter", "ok": true, ..., "time": 0.001}
+    # an "id" given with a command is returned with its response
+    COMMANDS = {
+        "load": "load",
+        "set_letter": "set_letter",
+        "set_word": "set_word",
+        "matches": "get_matches",
+        "unique_pairs": "get_unique_pairs",
+        "solve": "solve",
+        "undo": "undo",
+        "redo": "redo",
+        "progress": "get_progress"
+    }
+    SOLVING_METHODS = ("unique_pairs", "propagation", "search")
+
+    def __init__(self, krypto):
+        self.krypto = krypto
+
+    def run(self, input_file=sys.stdin, output_file=sys.stdout):
+        for line in input_file:
+            if not line.strip():
+                continue
+            output_file.write(json.dumps(self.handle_line(line), ensure_ascii=False) + "\n")
+            output_file.flush()
+
+    def handle_line(self, line):
+        response = {"command": None}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a command must be a json object")
+            if "id" in request:
+                response["id"] = request["id"]
+            response["command"] = command = request.get("command")
+            method_name = self.COMMANDS.get(command)
+            if method_name is None:
+                raise ValueError(f"unknown command {command}")
+            if command != "load" and self.krypto.puzzle is None:
+                raise ValueError("no puzzle loaded")
+            start_time = time.perf_counter()
+            result = getattr(self, method_name)(request)
+            self.krypto.puzzle.drop_old_checkpoints()
+            response["ok"] = True
+            response.update(result)
+            response["time"] = time.perf_counter() - start_time
+        except (KeyError, ValueError, TypeError, OSError) as error:
+            response["ok"] = False
+            response["error"] = f"{type(error).__name__}: {error}"
+        return response
+
+    def get_codeword(self, codeword_value):
+        # index of the codeword (starting from 1) or its numbers
+        puzzle = self.krypto.puzzle
+        if isinstance(codeword_value, int):
+            if not 1 <= codeword_value <= len(puzzle.codewords):
+                raise ValueError(f"{codeword_value} is not a valid codeword")
+            return puzzle.codewords[codeword_value - 1]
+        codeword = tuple(int(num) for num in codeword_value)
+        if codeword not in puzzle.codewords:
+            raise ValueError(f"{codeword_value} is not a valid codeword")
+        return codeword
+
+    def load(self, request):
+        if request.get("language") is not None:
+            if request["language"] not in self.krypto.config:
+                raise KeyError(f"language {request['language']} is not in the configuration")
+            self.krypto.set_language(request["language"])
+            self.krypto.wordlist_path = self.krypto.config[request["language"]][Krypto.WORDLIST_PATH_KEY]
+        codeword_path = get_codeword_path(request["path"]) or get_codeword_path(request["path"], self.krypto.config[self.krypto.language][Krypto.CODEWORD_FOLDER_PATH_KEY])
+        if codeword_path is None:
+            raise ValueError(mass_replace(self.krypto.current_language_dict["file_not_found_text"], request["path"]))
+        self.krypto.initialize_puzzle(codeword_path, self.krypto.wordlist_path)
+        return {"language": self.krypto.language, "file": str(codeword_path), "codewords": [list(codeword) for codeword in self.krypto.puzzle.codewords]}
+
+    def set_letter(self, request):
+        # checked before the checkpoint, with the same checks as add_to_substitution_dict
+        puzzle = self.krypto.puzzle
+        num = int(request["num"])
+        char = request.get("char") or ""
+        if not isinstance(char, str):
+            raise ValueError(f"{char} is not a letter")
+        char = char.lower()
+        if num not in puzzle.substitution_dict:
+            raise ValueError(f"invalid number: {num} {char}")
+        if char and char not in [c.lower() for c in puzzle.alphabet]:
+            raise ValueError(f"invalid letter: {num} {char}")
+        if char and char in puzzle.substitution_dict.values():
+            raise ValueError(f"double letter: {num} {char}")
+        puzzle.push_checkpoint()
+        puzzle.add_to_substitution_dict(num, char)
+        return {"substitution": self.get_substitution()}
+
+    def set_word(self, request):
+        puzzle = self.krypto.puzzle
+        codeword = self.get_codeword(request["codeword"])
+        if not isinstance(request["word"], str):
+            raise ValueError(f"{request['word']} is not a word")
+        word = request["word"].lower()
+        if not does_word_match(word, codeword):
+            raise ValueError(f"{word} and {codeword} do not match")
+        puzzle.push_checkpoint()
+        for num, char in zip(codeword, word):
+            puzzle.add_to_substitution_dict(num, char, override=True)
+        puzzle.rematch_words()
+        return {"in_wordlist": word in puzzle.matched_words_all[codeword], "substitution": self.get_substitution()}
+
+    def get_matches(self, request):
+        puzzle = self.krypto.puzzle
+        codewords = puzzle.codewords if request.get("codeword") is None else [self.get_codeword(request["codeword"])]
+        limit = request.get("limit")
+        matches = []
+        for codeword in codewords:
+            words = puzzle.matched_words.get(codeword, [])
+            matches.append({"codeword": list(codeword), "count": len(words), "words": words[:limit]})
+        return {"matches": matches}
+
+    def get_unique_pairs(self, request):
+        unique_pairs = self.krypto.puzzle.find_all_unique_pairs()
+        return {"unique_pairs": [{"codewords": [list(codeword1), list(codeword2)], "words": list(word_pair)} for (codeword1, codeword2), word_pair in unique_pairs]}
+
+    def solve(self, request):
+        puzzle = self.krypto.puzzle
+        method = request.get("method", "unique_pairs")
+        if method not in self.SOLVING_METHODS:
+            raise ValueError(f"unknown solving method {method}")
+        puzzle.push_checkpoint()
+        response = dict()
+        if method == "search":
+            response["solved"] = puzzle.search_for_solution(self.krypto.MAXIMUM_SEARCH_STEPS)
+            found_words = [(codeword, puzzle.get_decrypted_codeword(codeword)) for codeword in puzzle.codewords if puzzle.is_codeword_solved(codeword)]
+        elif method == "propagation":
+            found_words = list(puzzle.try_to_solve_by_propagation())
+        else:
+            found_words = list(puzzle.try_to_solve_using_unique_pairs())
+        response["found_words"] = [{"codeword": list(codeword), "word": word} for codeword, word in found_words]
+        response["stats"] = puzzle.get_solving_stats()
+        return response
+
+    def undo(self, request):
+        # like Krypto.undo, actions that did not change anything are skipped
+        while (num_of_changes := self.krypto.puzzle.rollback()) is not None:
+            if num_of_changes:
+                return {"changed": True, "substitution": self.get_substitution()}
+        return {"changed": False, "substitution": self.get_substitution()}
+
+    def redo(self, request):
+        while (num_of_changes := self.krypto.puzzle.redo()) is not None:
+            if num_of_changes:
+                return {"changed": True, "substitution": self.get_substitution()}
+        return {"changed": False, "substitution": self.get_substitution()}
+
+    def get_progress(self, request):
+        puzzle = self.krypto.puzzle
+        not_found_symbol = request.get("not_found_symbol", "_")
+        codewords = [{"codeword": list(codeword), "word": puzzle.get_decrypted_codeword(codeword, not_found_symbol), "matches": len(puzzle.matched_words.get(codeword, []))} for codeword in puzzle.codewords]
+        return {"codewords": codewords, "substitution": self.get_substitution(), "stats": puzzle.get_solving_stats()}
+
+    def get_substitution(self):
+        return {num: char for num, char in sorted(self.krypto.puzzle.substitution_dict.items()) if char}
+
+
+def main_solve(args):
+    parser = argparse.ArgumentParser(prog="krypto.py solve", description="Solve codeword puzzles without asking anything, one json line per puzzle.")
+    parser.add_argument("paths", nargs="*", help="csv files or folders with csv files (default: codeword_folder_path of the language)")
+    parser.add_argument("--lang", help="language tag in krypto.conf")
+    parser.add_argument("--jobs", type=int, default=1, help="number of puzzles solved at the same time")
+    parser.add_argument("--output", help="file to write the json lines to (default: standard output)")
+    parser.add_argument("--config", default=Krypto.DEFAULT_CONFIG_PATH, help="configuration file (default: %(default)s)")
+    parser.add_argument("--stats", action="store_true", help="count and time the solving steps of each puzzle")
+    arguments = parser.parse_args(args)
+    stats.enable(arguments.stats)
+    krypto = Krypto(config_path=arguments.config, language=arguments.lang)
+    codeword_paths = krypto.get_codeword_paths(arguments.paths)
+    if arguments.output is None:
+        krypto.solve_codeword_files(codeword_paths, arguments.jobs)
+        return krypto
+    with open(arguments.output, "w", encoding="utf-8") as output_file:
+        krypto.solve_codeword_files(codeword_paths, arguments.jobs, output_file)
+    return krypto
+
+
+def main_serve(args):
+    parser = argparse.ArgumentParser(prog="krypto.py serve", description="Keep the wordlists in memory and solve codeword puzzles sent over http.")
+    parser.add_argument("--lang", nargs="*", help="language tags in krypto.conf to load (default: all of them)")
+    parser.add_argument("--host", default=KryptoServer.DEFAULT_HOST, help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=KryptoServer.DEFAULT_PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--config", default=Krypto.DEFAULT_CONFIG_PATH, help="configuration file (default: %(default)s)")
+    arguments = parser.parse_args(args)
+    krypto = Krypto(config_path=arguments.config, language=arguments.lang[0] if arguments.lang else None)
+    languages = []
+    for language in arguments.lang or krypto.config.keys():
+        wordlist_path = krypto.wordlist_path if language == krypto.language else krypto.config[language][Krypto.WORDLIST_PATH_KEY]
+        if not Path(wordlist_path).is_file():
+            print(mass_replace(krypto.current_language_dict["file_not_found_text"], wordlist_path), file=sys.stderr)
+            continue
+        languages.append(language)
+    server = KryptoServer((arguments.host, arguments.port), krypto, languages)
+    print(mass_replace(krypto.current_language_dict["server_start_text"], f"http://{arguments.host}:{server.server_port}", ", ".join(languages)), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
         pass
+    server.server_close()
+    return krypto
+
+
+def main_session(args):
+    parser = argparse.ArgumentParser(prog="krypto.py session", description="Work on a codeword puzzle with json commands, one per line from standard input.")
+    parser.add_argument("path", nargs="?", help="csv file with the codewords (or load it with the load command)")
+    parser.add_argument("--lang", help="language tag in krypto.conf")
+    parser.add_argument("--config", default=Krypto.DEFAULT_CONFIG_PATH, help="configuration file (default: %(default)s)")
+    arguments = parser.parse_args(args)
+    krypto = Krypto(config_path=arguments.config, language=arguments.lang)
+    session = KryptoSession(krypto)
+    if arguments.path is not None:
+        print(json.dumps(session.handle_line(json.dumps({"command": "load", "path": arguments.path})), ensure_ascii=False), flush=True)
+    session.run()
+    return krypto
 
 
 def main_krypto():
+    if sys.argv[1:2] == ["solve"]:
+        return main_solve(sys.argv[2:])
+    if sys.argv[1:2] == ["serve"]:
+        return main_serve(sys.argv[2:])
+    if sys.argv[1:2] == ["session"]:
+        return main_session(sys.argv[2:])
+    if "--stats" in sys.argv:
+        stats.enable()
     # start_time_first = time.time()
     krypto = Krypto()
-    language, codeword_path = krypto.get_command_line_arguments()
+    language, codeword_path, session_path = krypto.get_command_line_arguments()
     if language:
         krypto.set_language(language)
     
-    if language and codeword_path:
+    if session_path is not None and krypto.resume_session(session_path):
+        # the puzzle continues from where the session was saved
+        pass
+    elif language and codeword_path:
         krypto.initialize_puzzle(codeword_path)
     elif language:
         krypto.input_data_and_initialize_puzzle(language=krypto.language)
@@ -1299,6 +3733,7 @@ def main_krypto():
         print()
         action = krypto.choose_main_choice()
         action()
+        krypto.puzzle.drop_old_checkpoints()
     return krypto
 
 
@@ -1,12 +1,17 @@
-
+import argparse
+import json
+import random
 import sys
+import tempfile
+from pathlib import Path
+from statistics import median
 from time import perf_counter_ns
 
 import krypto
+import puzzle_generator
 
 
-def show_time(description, start_time, end_time, unit=""):
-    elapsed_time = end_time - start_time
+def show_time(description, elapsed_time, unit=""):
     if unit == "micro":
         print(f"{description}  {round(elapsed_time / 1000, 3)} microseconds")
         return elapsed_time
@@ -17,110 +22,127 @@ def show_time(description, start_time, end_time, unit=""):
     return elapsed_time
 
 
-class PerformanceTest:
-    DEFAULT_CONFIG_PATH = "krypto.conf"
-    NAME_KEY = "name"
-    ALPHABET_KEY = "alphabet"
-    WORDLIST_PATH_KEY = "wordlist_path"
-    CODEWORD_FOLDER_PATH_KEY = "codeword_folder_path"
-
-    def __init__(self, language_tag, codewords_path):
-        self.language = language_tag
-        self.default_language, self.config = krypto.read_config(self.DEFAULT_CONFIG_PATH)
-        self.alphabet = self.config[self.language][self.ALPHABET_KEY]
-        self.wordlist_path = self.config[self.language][self.WORDLIST_PATH_KEY]
-        self.codeword_path = codewords_path
-
-
-    def time_get_wordlist(self):
-        start_time = perf_counter_ns()
-        self.wordlist = krypto.get_wordlist(self.wordlist_path)
-
-        end_time = perf_counter_ns()
-
-        description = f"get_wordlist (from '{self.wordlist_path}')"
-        # print(f"{len(self.wordlist)} words")
-        return show_time(description, start_time, end_time, "milli")
-    
-    def time_get_codewords(self):
-        start_time = perf_counter_ns()
-        comments, codewords = krypto.get_codewords(self.codeword_path)
-
-        self.codewords = codewords
-        self.comments = comments
-
-        end_time = perf_counter_ns()
-
-        description = f"get_codewords (from '{self.codeword_path}')"
-        # print(f"{len(self.codewords)} codewords")
-        return show_time(description, start_time, end_time, "micro")
-
-    def time_set_matched_words(self, codewords, wordlist, extra_description=""):
-        start_time = perf_counter_ns()
-        self.matched_words = dict()
-        for codeword in codewords:
-            words = krypto.get_matching_words(codeword, wordlist)
-            self.matched_words[codeword] = words
+def get_percentile(values, percentage):
+    # nearest rank
+    sorted_values = sorted(values)
+    rank = max(1, -(-len(sorted_values) * percentage // 100))
+    return sorted_values[rank - 1]
 
-        end_time = perf_counter_ns()
-        description = f"set_matched_words ({extra_description})"
-        return show_time(description, start_time, end_time)
 
-
-    def time_find_all_unique_pairs(self, codewordpuzzle, extra_description=""):
-        start_time = perf_counter_ns()
-        self.unique_pairs = codewordpuzzle.find_all_unique_pairs()
-
-        end_time = perf_counter_ns()
-        description = f"find_all_unique_pairs ({extra_description})"
-        return show_time(description, start_time, end_time)
+class PerformanceTest:
+    ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+
+    def __init__(self, seed=1, number_of_words=50_000, number_of_codewords=60, repeats=5, warmup=1, use_numpy=True):
+        self.settings = {
+            "seed": seed,
+            "number_of_words": number_of_words,
+            "number_of_codewords": number_of_codewords,
+            "repeats": repeats,
+            "warmup": warmup,
+            "numpy": use_numpy and krypto.np is not None
+        }
+        self.repeats = repeats
+        self.warmup = warmup
+        self.use_numpy = use_numpy
+        self.words = puzzle_generator.get_random_wordlist(random.Random(seed), number_of_words)
+        self.codewords, self.answers, _ = puzzle_generator.generate_puzzle(krypto.get_length_buckets(self.words), number_of_codewords, self.ALPHABET, seed)
+        self.results = dict()
+        self.is_solved = None
+
+    def time_phase(self, name, set_up, function, unit=""):
+        # set_up is not timed, its result is given to function
+        elapsed_times = []
+        for run in range(self.warmup + self.repeats):
+            argument = set_up()
+            start_time = perf_counter_ns()
+            function(argument)
+            end_time = perf_counter_ns()
+            if run >= self.warmup:
+                elapsed_times.append(end_time - start_time)
+        self.results[name] = {
+            "median_ns": median(elapsed_times),
+            "p95_ns": get_percentile(elapsed_times, 95),
+            "runs_ns": elapsed_times
+        }
+        show_time(f"{name} median", self.results[name]["median_ns"], unit)
+        show_time(f"{name} p95   ", self.results[name]["p95_ns"], unit)
+
+    def get_wordlists(self):
+        return krypto.get_compiled_wordlist(self.wordlist_path, self.ALPHABET, use_cache=False)
+
+    def get_wordlist_index(self, build=True):
+        wordlist_index = krypto.WordlistIndex(self.wordlists, self.ALPHABET, self.use_numpy)
+        if build:
+            wordlist_index.build()
+        return wordlist_index
+
+    def get_puzzle(self):
+        return krypto.CodewordPuzzle(self.codewords, None, self.ALPHABET, [], self.get_wordlist_index())
+
+    def solve(self, puzzle):
+        for _ in puzzle.try_to_solve_using_unique_pairs():
+            pass
+        puzzle.search_for_solution(krypto.Krypto.MAXIMUM_SEARCH_STEPS)
+        self.is_solved = all(puzzle.get_decrypted_codeword(codeword) == word for codeword, word in zip(self.codewords, self.answers))
 
     def run_all_performance_tests(self):
-
-        print(f"\n Language: {self.language} \n Wordlist path: {self.wordlist_path} \n Codewords path: {self.codeword_path}")
-
-        t1 = self.time_get_wordlist()
-
-        t2 = self.time_get_codewords()
-
-        t3 = self.time_set_matched_words(self.codewords, self.wordlist)
-
-        self.codewordpuzzle = krypto.CodewordPuzzle(self.codewords, self.wordlist, self.alphabet, self.comments)
-
-        t4 = self.time_find_all_unique_pairs(self.codewordpuzzle)
-
-        total_time = t1 + t2 + t3 + t4
-        print(f"{round(total_time / 1_000_000_000, 3)} seconds overall\n")
+        print(f"\n {len(self.words)} words, {len(self.codewords)} codewords, seed {self.settings['seed']}, NumPy: {self.settings['numpy']}")
+        with tempfile.TemporaryDirectory() as folder_path:
+            self.wordlist_path = Path(folder_path) / "wordlist.txt"
+            self.wordlist_path.write_text("\n".join(self.words), encoding="utf-8")
+            self.time_phase("load", lambda: None, lambda _: self.get_wordlists(), "milli")
+            self.wordlists = self.get_wordlists()
+        self.time_phase("index build", lambda: self.get_wordlist_index(False), lambda wordlist_index: wordlist_index.build(), "milli")
+        self.time_phase("initial matching", self.get_wordlist_index, lambda wordlist_index: krypto.CodewordPuzzle(self.codewords, None, self.ALPHABET, [], wordlist_index), "milli")
+        self.time_phase("unique pairs", self.get_puzzle, lambda puzzle: puzzle.find_all_unique_pairs(), "milli")
+        self.time_phase("full solve", self.get_puzzle, self.solve, "milli")
+        print(f"solved correctly: {self.is_solved}")
+        return self.results
+
+    def write_baseline(self, baseline_path):
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            baseline = {"settings": self.settings, "phases": self.results}
+            if krypto.stats.enabled:
+                baseline["instrumentation"] = krypto.stats.get_dict()
+            json.dump(baseline, f, indent=2)
+
+    def compare_to_baseline(self, baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["settings"] != self.settings:
+            print(f"\nbaseline {baseline_path} was run with different settings: {baseline['settings']}")
+        print(f"\ncompared to {baseline_path} (median, baseline median, ratio):")
+        for name, result in self.results.items():
+            baseline_result = baseline["phases"].get(name)
+            if baseline_result is None:
+                continue
+            ratio = result["median_ns"] / baseline_result["median_ns"]
+            print(f"{name}  {round(result['median_ns'] / 1_000_000, 3)} ms  {round(baseline_result['median_ns'] / 1_000_000, 3)} ms  {round(ratio, 2)}")
+
+
+def get_arguments(args):
+    parser = argparse.ArgumentParser(description="Time the phases of solving a synthetic codeword puzzle.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--words", type=int, default=50_000, help="number of words in the wordlist")
+    parser.add_argument("--codewords", type=int, default=60, help="number of codewords in the puzzle")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--no-numpy", action="store_true", help="do not use NumPy even if it is installed")
+    parser.add_argument("--output", help="write the results as a json baseline to this file")
+    parser.add_argument("--compare", help="compare the results to this json baseline")
+    parser.add_argument("--stats", action="store_true", help="count and time the solving steps during all the runs")
+    return parser.parse_args(args)
 
 
 if __name__ == "__main__":
-    do_fi = True
-    do_en = True
-    if "fi" in sys.argv and "en" not in sys.argv:
-        do_en = False
-    elif "fi" not in sys.argv and "en" in sys.argv:
-        do_fi = False
-
-    if do_fi:
-        language_tag = "fi"
-        codeword_path = "k24-51-52.csv"
-        pt_fi = PerformanceTest(language_tag, codeword_path)
-        pt_fi.run_all_performance_tests()
-
-        codeword_path = "k25-16-17.csv"
-        pt_fi = PerformanceTest(language_tag, codeword_path)
-        pt_fi.run_all_performance_tests()
-
-    if do_en:
-        language_tag = "en"
-        codeword_path = "cw25-05-12.csv"
-        pt_en = PerformanceTest(language_tag, codeword_path)
-        pt_en.run_all_performance_tests()
-
-        codeword_path = "cw25-05-22.csv"
-        pt_en = PerformanceTest(language_tag, codeword_path)
-        pt_en.run_all_performance_tests()
-
-        codeword_path = "cw25-05-23.csv"
-        pt_en = PerformanceTest(language_tag, codeword_path)
-        pt_en.run_all_performance_tests()
+    arguments = get_arguments(sys.argv[1:])
+    performance_test = PerformanceTest(arguments.seed, arguments.words, arguments.codewords, arguments.repeats, arguments.warmup, not arguments.no_numpy)
+    krypto.stats.enable(arguments.stats)
+    performance_test.run_all_performance_tests()
+    if arguments.stats:
+        print()
+        krypto.stats.print_table()
+    if arguments.compare:
+        performance_test.compare_to_baseline(arguments.compare)
+    if arguments.output:
+        performance_test.write_baseline(arguments.output)
@@ -0,0 +1,152 @@
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+
+import krypto
+
+
+# letters of random words are drawn with roughly the frequencies of English text
+LETTER_WEIGHTS = {
+    "a": 82, "b": 15, "c": 28, "d": 43, "e": 127, "f": 22, "g": 20, "h": 61, "i": 70, "j": 2, "k": 8, "l": 40, "m": 24,
+    "n": 67, "o": 75, "p": 19, "q": 1, "r": 60, "s": 63, "t": 91, "u": 28, "v": 10, "w": 24, "x": 2, "y": 20, "z": 1
+}
+ANSWER_FILE_SUFFIX = ".answers.json"
+MAXIMUM_COVERAGE_ATTEMPTS = 1000
+MAXIMUM_RANDOM_TRIES = 100
+
+
+def get_random_wordlist(random_generator, number_of_words, minimum_length=2, maximum_length=12):
+    letters = list(LETTER_WEIGHTS.keys())
+    weights = list(LETTER_WEIGHTS.values())
+    words = dict()
+    while len(words) < number_of_words:
+        length = random_generator.randint(minimum_length, maximum_length)
+        words["".join(random_generator.choices(letters, weights, k=length))] = None
+    return list(words.keys())
+
+
+def get_letter_coverage(words, alphabet):
+    letters = set("".join(words))
+    return len([char for char in alphabet if char in letters]) / len(alphabet)
+
+
+def choose_random_word(random_generator, wordlists, lengths, weights, chosen_words):
+    # a word that is not in chosen_words: a few random tries first, then from the words that are left
+    chosen_words = set(chosen_words)
+    for _ in range(MAXIMUM_RANDOM_TRIES):
+        word = random_generator.choice(wordlists[random_generator.choices(lengths, weights)[0]])
+        if word not in chosen_words:
+            return word
+    words_left = dict()
+    for length, weight in zip(lengths, weights):
+        words = [word for word in dict.fromkeys(wordlists[length]) if word not in chosen_words]
+        if words:
+            words_left[length] = (weight, words)
+    if not words_left:
+        raise ValueError("all the words of the wanted lengths have been chosen")
+    length = random_generator.choices(list(words_left.keys()), [weight for weight, _ in words_left.values()])[0]
+    return random_generator.choice(words_left[length][1])
+
+
+def choose_words(random_generator, wordlists, number_of_words, length_weights=None, letter_coverage=0.0, alphabet=None):
+    # wordlists are length buckets, length_weights[length] is the relative share of words of that length,
+    # words are swapped for new ones until at least letter_coverage of the alphabet is used (or attempts run out)
+    if length_weights is None:
+        length_weights = {length: len(words) for length, words in wordlists.items() if length >= 3}
+    lengths = [length for length, weight in length_weights.items() if weight > 0 and wordlists.get(length)]
+    if not lengths:
+        raise ValueError("no words of the wanted lengths in the wordlist")
+    weights = [length_weights[length] for length in lengths]
+    if sum(len(set(wordlists[length])) for length in lengths) < number_of_words:
+        raise ValueError("not enough words of the wanted lengths in the wordlist")
+    words = []
+    for _ in range(number_of_words):
+        words.append(choose_random_word(random_generator, wordlists, lengths, weights, words))
+    if alphabet is None:
+        return words
+    for _ in range(MAXIMUM_COVERAGE_ATTEMPTS):
+        coverage = get_letter_coverage(words, alphabet)
+        if coverage >= letter_coverage:
+            break
+        # a new word replaces one at random if it does not make the coverage worse
+        index = random_generator.randrange(number_of_words)
+        try:
+            new_word = choose_random_word(random_generator, wordlists, lengths, weights, words)
+        except ValueError:
+            # every word is already in use, so there is nothing to swap
+            break
+        new_words = words[:index] + [new_word] + words[index + 1:]
+        if get_letter_coverage(new_words, alphabet) >= coverage:
+            words = new_words
+    return words
+
+
+def get_random_substitution(random_generator, alphabet):
+    # nums_by_char: a random one-to-one map from the letters to numbers 1, 2, ..., len(alphabet)
+    nums = list(range(1, len(alphabet) + 1))
+    random_generator.shuffle(nums)
+    return dict(zip(alphabet, nums))
+
+
+def encrypt_words(words, nums_by_char):
+    return [tuple(nums_by_char[char] for char in word) for word in words]
+
+
+def generate_puzzle(wordlists, number_of_words, alphabet, seed=None, length_weights=None, letter_coverage=0.0):
+    random_generator = random.Random(seed)
+    words = choose_words(random_generator, wordlists, number_of_words, length_weights, letter_coverage, alphabet)
+    nums_by_char = get_random_substitution(random_generator, alphabet)
+    return encrypt_words(words, nums_by_char), words, nums_by_char
+
+
+def get_answer_path(codeword_path):
+    codeword_path = Path(codeword_path)
+    return codeword_path.with_name(codeword_path.stem + ANSWER_FILE_SUFFIX)
+
+
+def write_answers(answer_path, codewords, words):
+    substitution = dict()
+    for codeword, word in zip(codewords, words):
+        for num, char in zip(codeword, word):
+            substitution[num] = char
+    with open(answer_path, "w", encoding="utf-8") as f:
+        json.dump({"substitution": dict(sorted(substitution.items())), "words": words}, f, ensure_ascii=False, indent=2)
+
+
+def read_answers(answer_path):
+    with open(answer_path, "r", encoding="utf-8") as f:
+        answers = json.load(f)
+    return {int(num): char for num, char in answers["substitution"].items()}, answers["words"]
+
+
+def get_length_weights(length_weights_str):
+    # e.g. "4:1,5:2,6:2"
+    if not length_weights_str:
+        return
+    length_weights = dict()
+    for item in length_weights_str.split(","):
+        length, weight = item.split(":")
+        length_weights[int(length)] = float(weight)
+    return length_weights
+
+
+def get_arguments(args):
+    parser = argparse.ArgumentParser(description="Encrypt words of a wordlist into a codeword puzzle csv and write the answers next to it.")
+    parser.add_argument("wordlist_path")
+    parser.add_argument("codeword_path", help="the csv file to write, the answers go to a file ending with " + ANSWER_FILE_SUFFIX)
+    parser.add_argument("--words", type=int, default=50, help="number of codewords")
+    parser.add_argument("--alphabet", default="abcdefghijklmnopqrstuvwxyz")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--lengths", help="relative shares of word lengths, e.g. 4:1,5:2,6:2 (default: as in the wordlist)")
+    parser.add_argument("--coverage", type=float, default=0.0, help="share of the alphabet the words should use, e.g. 0.9")
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    arguments = get_arguments(sys.argv[1:])
+    wordlists = krypto.get_compiled_wordlist(arguments.wordlist_path, arguments.alphabet, use_cache=False)
+    codewords, words, nums_by_char = generate_puzzle(wordlists, arguments.words, arguments.alphabet, arguments.seed, get_length_weights(arguments.lengths), arguments.coverage)
+    krypto.write_codewords(arguments.codeword_path, codewords, [f"generated from {arguments.wordlist_path}, seed {arguments.seed}"])
+    write_answers(get_answer_path(arguments.codeword_path), codewords, words)
@@ -1,3 +1,10 @@
+import io
+import json
+import multiprocessing
+import os
+import threading
+import urllib.error
+import urllib.request
 
 from pathlib import Path
 import pytest
@@ -38,6 +45,91 @@ def test_get_wordlist():
     assert krypto.get_wordlist(wordlist_path) == expected_wordlist
 
 
+def test_get_compiled_wordlist(tmp_path, monkeypatch):
+    wordlist_path = tmp_path / "wordlist.txt"
+    wordlist_path.write_text("Some\twords\nhere\nto\nbe\nread\nby\nbook\n", encoding="utf-8")
+    cache_path = krypto.get_wordlist_cache_path(wordlist_path)
+    expected_wordlists = {4: ["some", "here", "read"], 2: ["to", "be", "by"]}
+
+    assert krypto.get_compiled_wordlist(wordlist_path, "abcdefghijklmnopqrstuvwxyz") == {4: ["some", "here", "read", "book"], 2: ["to", "be", "by"]}
+    assert cache_path.exists()
+    assert krypto.get_compiled_wordlist(wordlist_path, "abcdehmorsty") == expected_wordlists
+
+    def fail_to_parse(wordlist_path):
+        raise AssertionError("the cache should have been used")
+    monkeypatch.setattr(krypto, "get_wordlist", fail_to_parse)
+    assert krypto.get_compiled_wordlist(wordlist_path, "abcdehmorsty") == expected_wordlists
+
+
+def test_get_compiled_wordlist_invalidated_by_source_change(tmp_path):
+    wordlist_path = tmp_path / "wordlist.txt"
+    wordlist_path.write_text("some\nhere\n", encoding="utf-8")
+    assert krypto.get_compiled_wordlist(wordlist_path) == {4: ["some", "here"]}
+    wordlist_path.write_text("some\nhere\nto\n", encoding="utf-8")
+    assert krypto.get_compiled_wordlist(wordlist_path) == {4: ["some", "here"], 2: ["to"]}
+
+
+def test_get_compiled_wordlist_with_lengths_and_no_cache_yet(tmp_path, monkeypatch):
+    wordlist_path = tmp_path / "wordlist.txt"
+    wordlist_path.write_text("some\twords\nhere\nto\nwords\n", encoding="utf-8")
+
+    def fail_to_read_all(*args, **kwargs):
+        raise AssertionError("the whole wordlist should not be read into memory")
+    monkeypatch.setattr(krypto, "get_wordlist", fail_to_read_all)
+    assert krypto.get_compiled_wordlist(wordlist_path, lengths={2, 5}) == {2: ["to"], 5: ["words"]}
+    # the cache still has every length
+    fingerprint = krypto.get_wordlist_fingerprint(wordlist_path, None)
+    assert krypto.read_wordlist_cache(krypto.get_wordlist_cache_path(wordlist_path), fingerprint) == {4: ["some", "here"], 2: ["to"], 5: ["words"]}
+
+    # the words are found even if the cache cannot be written
+    monkeypatch.setattr(krypto, "write_wordlist_cache", lambda *args: False)
+    assert krypto.get_compiled_wordlist(wordlist_path, "abcdehmorstwy", lengths={4, 5}) == {4: ["some", "here"], 5: ["words"]}
+
+
+def test_read_wordlist_cache_with_lengths(tmp_path):
+    wordlist_path = tmp_path / "wordlist.txt"
+    wordlist_path.write_text("some\nhere\nto\nwords\n", encoding="utf-8")
+    cache_path = krypto.get_wordlist_cache_path(wordlist_path)
+    fingerprint = krypto.get_wordlist_fingerprint(wordlist_path, None)
+    assert krypto.write_wordlist_cache(cache_path, fingerprint, {4: ["some", "here"], 2: ["to"], 5: ["words"]})
+    assert krypto.read_wordlist_cache(cache_path, fingerprint, {2, 5}) == {2: ["to"], 5: ["words"]}
+    assert krypto.read_wordlist_cache(cache_path, fingerprint, {3}) == dict()
+    assert krypto.read_wordlist_cache(cache_path, fingerprint) == {4: ["some", "here"], 2: ["to"], 5: ["words"]}
+    assert krypto.read_wordlist_cache(cache_path, krypto.get_wordlist_fingerprint(wordlist_path, "abc")) is None
+
+
+def test_binary_wordlist(tmp_path):
+    wordlist_path = Path(__file__).parent / "test_stuff" / "test_wordlist"
+    binary_path = tmp_path / "test_wordlist.bin"
+    wordlist = krypto.get_wordlist(wordlist_path)
+    krypto.write_binary_wordlist(binary_path, wordlist, "abcdefghijklmnopqrstuvwxyz")
+
+    assert sorted(krypto.get_wordlist(binary_path)) == sorted(wordlist)
+    mapped_wordlist = krypto.open_binary_wordlist(binary_path)
+    assert isinstance(mapped_wordlist, krypto.MappedWordlist)
+    assert len(mapped_wordlist) == len(wordlist)
+    assert sorted(mapped_wordlist) == sorted(wordlist)
+    assert list(mapped_wordlist.wordlists[4]) == ["some", "here", "read", "cola", "camp"]
+    assert mapped_wordlist.wordlists[4][-1] == "camp"
+    assert mapped_wordlist.wordlists[2][1:3] == ["be", "by"]
+    with pytest.raises(IndexError):
+        mapped_wordlist.wordlists[2][4]
+
+    assert krypto.get_compiled_wordlist(binary_path, "abcdehmorsty")[4] == ["some", "here", "read"]
+    mapped_wordlist.close()
+
+
+def test_get_compiled_wordlist_with_binary_wordlist_and_other_alphabet(tmp_path, monkeypatch):
+    wordlist_path = Path(__file__).parent / "test_stuff" / "test_wordlist"
+    binary_path = tmp_path / "test_wordlist.bin"
+    krypto.write_binary_wordlist(binary_path, krypto.get_wordlist(wordlist_path), "abcdefghijklmnopqrstuvwxyz")
+
+    def fail_to_map_again(*args, **kwargs):
+        raise AssertionError("the open memory map should have been used")
+    monkeypatch.setattr(krypto, "get_wordlist", fail_to_map_again)
+    assert krypto.get_compiled_wordlist(binary_path, "abcdehmorsty", lengths={2, 4}) == {4: ["some", "here", "read"], 2: ["to", "be", "by", "or"]}
+
+
 def test_get_csv_files_in_folder():
     csv_files = list(krypto.get_csv_files_in_folder())
     path1 = Path(__file__).parent.parent / "cw25-05-12.csv"
@@ -88,6 +180,35 @@ def test_find_correspondence0():
     assert krypto.find_correspondence(4, substitutions) is None
 
 
+def test_Substitution():
+    substitution = krypto.Substitution("abcdefghijklmnopqrstuvwxyz", ((3, "x"), (1, "a"), (25, "e")))
+    assert len(substitution) == 3
+    assert list(substitution) == [(1, "a"), (3, "x"), (25, "e")]
+    assert substitution.get_char(3) == "x"
+    assert substitution.get_char(2) is None
+    assert substitution.get_char(100) is None
+    assert substitution.get_num("e") == 25
+    assert substitution.get_num("b") is None
+    assert not substitution.add(3, "y")
+
+    extended_substitution = substitution.with_word((1, 7, 8), "aä!")
+    assert extended_substitution.get_num("ä") == 7
+    assert extended_substitution.get_char(8) == "!"
+    assert len(extended_substitution) == 5
+    assert substitution.get_num("ä") is None
+    assert substitution.get_char(7) is None
+
+
+def test_find_correspondence_with_Substitution():
+    substitution = krypto.Substitution("abcdefghijklmnopqrstuvwxyz", ((1, "a"), (2, "b"), (3, "x"), (5, "p")))
+    assert krypto.find_correspondence(1, substitution) == "a"
+    assert krypto.find_correspondence("x", substitution) == 3
+    assert krypto.find_correspondence("c", substitution) is None
+    assert krypto.find_correspondence(4, substitution) is None
+    assert krypto.nums_to_letters((5, 1, 2), substitution) == "pab"
+    assert krypto.decrypt_codeword((5, 4, 3), substitution) == "p?x"
+
+
 def test_nums_to_letters():
     nums = (1, 3, 25)
     substitution = ((1, "a"), (2, "b"), (3, "c"), (10, "j"), (15, "q"), (25, "e"))
@@ -161,6 +282,8 @@ def test_does_word_match(word, codeword, result):
 )
 def test_does_word_match_to_substitution_tuple(word, codeword, substitution_tuple, result):
     assert krypto.does_word_match_to_substitution_tuple(word, codeword, substitution_tuple) == result
+    substitution = krypto.Substitution("abcdefghijklmnopqrstuvwxyz", substitution_tuple)
+    assert krypto.does_word_match_to_substitution(word, codeword, substitution) == result
 
 
 @pytest.mark.parametrize(
@@ -209,6 +332,37 @@ def test_do_words_match_to_matching_indices():
     assert krypto.do_words_match_to_matching_indices(word1, word2, matching_indices, indices_in_word1, indices_in_word2)
 
 
+def test_group_words_by_indices():
+    words = ["hello", "world", "help", "yellow"]
+    assert krypto.group_words_by_indices(words, (1, 2)) == {("e", "l"): ["hello", "help", "yellow"], ("o", "r"): ["world"]}
+    assert krypto.group_words_by_indices(words, (0,)) == {"h": ["hello", "help"], "w": ["world"], "y": ["yellow"]}
+    assert krypto.group_words_by_indices(words, ()) == {"": words}
+    assert krypto.group_words_by_indices(words, (0,), [1, 2, 3, 4]) == {"h": [1, 3], "w": [2], "y": [4]}
+
+
+@pytest.mark.parametrize(
+    "codeword1, codeword2, maximum_matches", [
+        ((1, 2, 3, 3, 4), (3, 5, 6, 2), 999),
+        ((1, 2, 3, 4), (5, 6, 7, 8), 999),
+        ((1, 2, 3, 4), (4, 3, 2, 1), 999),
+        ((1, 2, 3, 4), (5, 6, 7, 8), 2)
+    ]
+)
+def test_match_word_lists(codeword1, codeword2, maximum_matches):
+    wordlist = ["hello", "world", "tiny", "abccd", "live", "love", "evil", "vile", "hill", "lake", "bake", "time", "yoke"]
+    words1 = krypto.get_matching_words(codeword1, wordlist)
+    words2 = krypto.get_matching_words(codeword2, wordlist)
+    matching_indices, others1, others2 = krypto.get_matching_indices(codeword1, codeword2)
+    expected_pairs = [(word1, word2) for word1 in words1 for word2 in words2 if krypto.do_words_match_to_matching_indices(word1, word2, matching_indices, others1, others2)]
+    if len(expected_pairs) > maximum_matches:
+        expected_pairs = []
+    assert krypto.match_word_lists(words1, words2, matching_indices, others1, others2, maximum_matches) == expected_pairs
+    letter_bits = {char: 1 << code for code, char in enumerate("abcdefghijklmnopqrstuvwxyz")}
+    letter_masks1 = [krypto.get_letter_mask(word, letter_bits) for word in words1]
+    letter_masks2 = [krypto.get_letter_mask(word, letter_bits) for word in words2]
+    assert krypto.match_word_lists(words1, words2, matching_indices, others1, others2, maximum_matches, letter_masks1, letter_masks2) == expected_pairs
+
+
 def test_get_matching_words():
     codeword = (1, 2, 3, 3, 4)
     wordlist = ["hello", "world", "tiny", "english", "abccd"]
@@ -216,6 +370,52 @@ def test_get_matching_words():
     assert krypto.get_matching_words(codeword, wordlist) == expected_answer
 
 
+@pytest.mark.parametrize(
+    "word, expected_pattern", [
+        ("kakku", (0, 1, 0, 0, 2)),
+        ("hello", (0, 1, 2, 2, 3)),
+        ((4, 1, 4, 7, 7), (0, 1, 0, 2, 2)),
+        ("", tuple())
+    ]
+)
+def test_get_word_pattern(word, expected_pattern):
+    assert krypto.get_word_pattern(word) == expected_pattern
+
+
+def test_get_matching_words_with_wordlist_index():
+    codeword = (1, 2, 3, 3, 4)
+    wordlist = ["hello", "world", "tiny", "english", "abccd"]
+    wordlist_index = krypto.WordlistIndex(krypto.get_length_buckets(wordlist))
+    expected_answer = ["hello", "abccd"]
+    assert krypto.get_matching_words(codeword, wordlist, wordlist_index=wordlist_index) == expected_answer
+    assert krypto.get_matching_words((1, 2, 3), wordlist, wordlist_index=wordlist_index) == []
+    assert wordlist_index.get_word_ids_matching_codeword(codeword) == [0, 2]
+
+
+def test_bitsets_and_word_ids():
+    word_ids = [0, 3, 8, 9, 17]
+    bitset = krypto.get_bitset_from_word_ids(word_ids)
+    assert bitset == sum(1 << word_id for word_id in word_ids)
+    assert krypto.get_word_ids_from_bitset(bitset) == word_ids
+    assert krypto.get_word_ids_from_bitset(0) == []
+
+
+def test_get_position_letter_bitsets():
+    bitsets = krypto.get_position_letter_bitsets(["some", "read", "cola", "camp"])
+    assert bitsets[(0, "c")] == 0b1100
+    assert bitsets[(3, "a")] == 0b0100
+    assert bitsets[(1, "o")] == 0b0101
+    assert (1, "x") not in bitsets
+
+
+def test_WordlistIndex_get_letter_masks():
+    wordlist_index = krypto.WordlistIndex({4: ["some", "read", "cola", "caäa"]}, "abcdefghijklmnopqrstuvwxyz")
+    assert wordlist_index.get_letter_masks(4)[2] == (1 << 2) | (1 << 14) | (1 << 11) | (1 << 0)
+    # "ä" is not in the alphabet, so it gets the next free bit
+    assert wordlist_index.get_letter_masks(4)[3] == (1 << 2) | (1 << 0) | (1 << 26)
+    assert wordlist_index.get_letter_masks(5) == []
+
+
 def test_does_word_match_to_matching_indices():
     word = "hello"
     dict_works = {
@@ -311,6 +511,15 @@ def puzzle():
     return krypto.CodewordPuzzle(codewords, wordlist, config_dict[default_language]["alphabet"], comments)
 
 
+@pytest.fixture
+def krypto_instance(tmp_path):
+    # a copy of the test wordlist, so that its cache goes to tmp_path
+    package_path = Path(__file__).parent
+    wordlist_path = tmp_path / "test_wordlist"
+    wordlist_path.write_text((package_path / "test_stuff" / "test_wordlist").read_text(encoding="utf-8"), encoding="utf-8")
+    return krypto.Krypto(package_path / "language_file", package_path / "krypto.conf", "en", wordlist_path)
+
+
 def test_CodewordPuzzle_init(puzzle):
     expected_codewords = [
         (1, 2, 3, 4, 5, 6),
@@ -410,8 +619,660 @@ def test_CodewordPuzzle_init(puzzle):
 #     m_indices = {"s": [0], "o": [1], "m": [2], "e": [3]}
 
 
+def test_CodewordPuzzle_with_binary_wordlist(puzzle, tmp_path):
+    binary_path = tmp_path / "test_wordlist.bin"
+    krypto.write_binary_wordlist(binary_path, puzzle.wordlist)
+    mapped_wordlist = krypto.open_binary_wordlist(binary_path)
+    mapped_puzzle = krypto.CodewordPuzzle(puzzle.codewords, mapped_wordlist, puzzle.alphabet, puzzle.comments)
+    assert mapped_puzzle.matched_words_all == puzzle.matched_words_all
+    mapped_wordlist.close()
+
+
+def test_WordlistIndex_close_with_binary_wordlist(puzzle, tmp_path):
+    binary_path = tmp_path / "test_wordlist.bin"
+    krypto.write_binary_wordlist(binary_path, puzzle.wordlist)
+    wordlist_index = krypto.WordlistIndex(krypto.get_compiled_wordlist(binary_path, "abcdefghijklmnopqrstuvwxyz"))
+    buffer = wordlist_index.wordlists[4].buffer
+    assert wordlist_index.get_matching_words((1, 2, 3, 4))
+    wordlist_index.close()
+    assert buffer.closed
+    # the file can be replaced once the memory map is closed
+    binary_path.unlink()
+
+
+@pytest.mark.parametrize(
+    "substitutions, expected_matches", [
+        ({15: "e"}, {(3, 22, 24, 15): ["some"], (21, 15, 13, 11): ["read"]}),
+        ({3: "c"}, {(3, 22, 24, 15): ["cola", "camp"], (21, 15, 13, 11): ["some", "read"]}),
+        ({3: "c", 24: "m"}, {(3, 22, 24, 15): ["camp"], (21, 15, 13, 11): ["read"]}),
+        ({11: "x"}, {(3, 22, 24, 15): ["some", "read", "cola", "camp"], (21, 15, 13, 11): []})
+    ]
+)
+def test_set_matched_words(puzzle, substitutions, expected_matches):
+    for num, char in substitutions.items():
+        puzzle.substitution_dict[num] = char
+    puzzle.set_matched_words()
+    substitution_tuple = puzzle.get_substitution_tuple()
+    for codeword, words in puzzle.matched_words_all.items():
+        expected_words = [word for word in words if krypto.does_word_match_to_substitution_tuple(word, codeword, substitution_tuple)]
+        assert puzzle.matched_words[codeword] == expected_words
+        assert puzzle.get_number_of_matches(codeword) == len(expected_words)
+    for codeword, words in expected_matches.items():
+        assert puzzle.matched_words[codeword] == words
+
+
+def test_get_codewords_by_num():
+    codewords = [(1, 2, 2), (2, 3), (1, 2, 2), (4, )]
+    assert krypto.get_codewords_by_num(codewords) == {1: [(1, 2, 2)], 2: [(1, 2, 2), (2, 3)], 3: [(2, 3)], 4: [(4, )]}
+
+
+@pytest.mark.parametrize(
+    "substitutions", [
+        ((15, "e"), (3, "s")),
+        ((3, "c"), (24, "m"), (3, "s")),
+        ((3, "c"), (24, "m"), (24, "")),
+        ((11, "p"), (3, "p"), (24, "c"))
+    ]
+)
+def test_add_to_substitution_dict_updates_matched_words(puzzle, substitutions):
+    for num, char in substitutions:
+        puzzle.add_to_substitution_dict(num, char, override=True)
+    incrementally_matched_words = {codeword: words for codeword, words in puzzle.matched_words.items() if words}
+    incremental_counts = dict(puzzle.unsolved_nums_counts)
+    puzzle.set_matched_words()
+    assert incrementally_matched_words == {codeword: words for codeword, words in puzzle.matched_words.items() if words}
+    assert incremental_counts == puzzle.unsolved_nums_counts
+
+
+@pytest.mark.parametrize(
+    "substitutions, expected_substitution", [
+        (((15, "e"), (3, "c")), {15: "e", 3: "c"}),
+        (((3, "c"), (15, "a"), (3, "b")), {3: "b", 15: "a"}),
+        (((3, "c"), (15, "a"), (15, "")), {3: "c"}),
+        (((11, "d"), (3, "d"), (24, "c")), {3: "d", 24: "c"})
+    ]
+)
+def test_add_to_substitution_dict_updates_matched_words_with_letters_of_the_alphabet(puzzle, substitutions, expected_substitution):
+    # letters of the fixture alphabet, so that every change and take-back is applied
+    for num, char in substitutions:
+        puzzle.add_to_substitution_dict(num, char, override=True)
+    assert {num: char for num, char in puzzle.substitution_dict.items() if char} == expected_substitution
+    incrementally_matched_words = {codeword: words for codeword, words in puzzle.matched_words.items() if words}
+    incremental_counts = dict(puzzle.unsolved_nums_counts)
+    puzzle.set_matched_words()
+    assert incrementally_matched_words == {codeword: words for codeword, words in puzzle.matched_words.items() if words}
+    assert incremental_counts == puzzle.unsolved_nums_counts
+
+
+def test_rollback_and_redo(puzzle):
+    initial_matched_words = dict(puzzle.matched_words)
+    puzzle.push_checkpoint()
+    puzzle.add_to_substitution_dict(3, "c")
+    puzzle.push_checkpoint()
+    puzzle.add_to_substitution_dict(15, "a")
+    assert puzzle.matched_words[(3, 22, 24, 15)] == ["cola"]
+
+    assert puzzle.rollback() > 0
+    assert puzzle.substitution_dict[15] == ""
+    assert puzzle.substitution_dict[3] == "c"
+    assert puzzle.matched_words[(3, 22, 24, 15)] == ["cola", "camp"]
+    assert puzzle.rollback() > 0
+    assert puzzle.matched_words == initial_matched_words
+    assert puzzle.unsolved_nums_counts[(3, 22, 24, 15)] == 4
+    assert puzzle.rollback() is None
+
+    assert puzzle.redo() > 0
+    assert puzzle.redo() > 0
+    assert puzzle.matched_words[(3, 22, 24, 15)] == ["cola"]
+    assert puzzle.unsolved_nums_counts[(3, 22, 24, 15)] == 2
+    assert puzzle.redo() is None
+    # the trail has the bitsets of the candidates, not the words
+    assert not any(isinstance(item, list) for change in puzzle.trail for item in change)
+
+
+def test_drop_old_checkpoints(puzzle):
+    for num, char in [(3, "c"), (15, "a"), (22, "b")]:
+        puzzle.push_checkpoint()
+        puzzle.add_to_substitution_dict(num, char)
+    puzzle.drop_old_checkpoints(2)
+    assert len(puzzle.checkpoints) == 2
+    assert puzzle.checkpoints[0] == 0
+    assert puzzle.rollback() > 0
+    assert puzzle.rollback() > 0
+    assert puzzle.rollback() is None
+    assert puzzle.trail == []
+    assert puzzle.substitution_dict[3] == "c"
+    assert puzzle.matched_words[(3, 22, 24, 15)] == ["cola", "camp"]
+
+
+def test_clear_substitution_dict_can_be_rolled_back(puzzle):
+    puzzle.add_to_substitution_dict(15, "e")
+    matched_words = dict(puzzle.matched_words)
+    puzzle.push_checkpoint()
+    puzzle.clear_substitution_dict()
+    assert puzzle.substitution_dict[15] == ""
+    assert puzzle.matched_words[(21, 15, 13, 11)] == ["some", "read", "cola", "camp"]
+    puzzle.rollback()
+    assert puzzle.substitution_dict[15] == "e"
+    assert puzzle.matched_words == matched_words
+
+
+def test_get_matched_pairs_is_cached_by_candidate_versions(puzzle, monkeypatch):
+    codeword1 = (3, 22, 24, 15)
+    codeword2 = (21, 15, 13, 11)
+    calls = []
+    match_two_codewords = puzzle.match_two_codewords
+    def counting_match_two_codewords(*args):
+        calls.append(args)
+        return match_two_codewords(*args)
+    monkeypatch.setattr(puzzle, "match_two_codewords", counting_match_two_codewords)
+
+    assert puzzle.get_matched_pairs(codeword1, codeword2, 1) == [("some", "read")]
+    assert puzzle.get_matched_pairs(codeword1, codeword2, 1) == [("some", "read")]
+    assert len(calls) == 1
+
+    puzzle.push_checkpoint()
+    puzzle.add_to_substitution_dict(3, "c")
+    assert puzzle.get_matched_pairs(codeword1, codeword2, 1) == []
+    assert len(calls) == 2
+    puzzle.rollback()
+    assert puzzle.get_matched_pairs(codeword1, codeword2, 1) == [("some", "read")]
+    assert len(calls) == 2
+    assert puzzle.find_all_unique_pairs() == [((codeword1, codeword2), ("some", "read"))]
+    assert len(calls) == 2
+
+
 def test_match_two_codewords(puzzle):
     codeword1 = (3, 22, 24, 15)
     codeword2 = (21, 15, 13, 11)
     maximum_matches = 999_999
     assert puzzle.match_two_codewords(codeword1, codeword2, maximum_matches) == [("some", "read")]
+
+
+@pytest.mark.skipif(krypto.np is None, reason="NumPy is not installed")
+def test_numpy_engine_gives_same_results(puzzle):
+    wordlist_index = krypto.WordlistIndex(puzzle.wordlists, puzzle.alphabet, use_numpy=True)
+    numpy_puzzle = krypto.CodewordPuzzle(puzzle.codewords, puzzle.wordlist, puzzle.alphabet, puzzle.comments, wordlist_index)
+    assert numpy_puzzle.wordlist_index.numpy_engine is not None
+    assert numpy_puzzle.matched_words_all == puzzle.matched_words_all
+
+    codeword1 = (3, 22, 24, 15)
+    codeword2 = (21, 15, 13, 11)
+    assert numpy_puzzle.match_two_codewords(codeword1, codeword2, 999_999) == [("some", "read")]
+    assert numpy_puzzle.match_two_codewords(codeword2, codeword1, 999_999) == puzzle.match_two_codewords(codeword2, codeword1, 999_999)
+    assert numpy_puzzle.match_two_codewords(codeword1, codeword1, 1) == puzzle.match_two_codewords(codeword1, codeword1, 1)
+
+    for substitution_puzzle in (puzzle, numpy_puzzle):
+        substitution_puzzle.substitution_dict[3] = "c"
+        substitution_puzzle.set_matched_words()
+    assert numpy_puzzle.matched_words == puzzle.matched_words
+
+
+def test_WordlistIndex_without_numpy(monkeypatch):
+    monkeypatch.setattr(krypto, "np", None)
+    wordlist_index = krypto.WordlistIndex({4: ["some", "read"]}, "abcdefg", use_numpy=True)
+    assert wordlist_index.numpy_engine is None
+    assert wordlist_index.get_matching_words((1, 2, 3, 4)) == ["some", "read"]
+
+
+def test_propagate_constraints(puzzle):
+    codeword1 = (3, 22, 24, 15)
+    codeword2 = (21, 15, 13, 11)
+    puzzle.push_checkpoint()
+    assert puzzle.propagate_constraints()
+    assert puzzle.matched_words[codeword1] == ["some"]
+    assert puzzle.matched_words[codeword2] == ["read"]
+    puzzle.rollback()
+    assert puzzle.matched_words[codeword1] == ["some", "read", "cola", "camp"]
+
+
+def test_try_to_solve_by_propagation(puzzle):
+    full_puzzle = krypto.CodewordPuzzle(puzzle.codewords, puzzle.wordlist, "abcdefghijklmnopqrstuvwxyz", puzzle.comments)
+    found_words = dict(full_puzzle.try_to_solve_by_propagation())
+    assert found_words[(3, 22, 24, 15)] == "some"
+    assert found_words[(21, 15, 13, 11)] == "read"
+    assert full_puzzle.get_decrypted_codeword((3, 22, 24, 15)) == "some"
+
+
+def test_search_for_solution(puzzle):
+    full_puzzle = krypto.CodewordPuzzle(puzzle.codewords, puzzle.wordlist, "abcdefghijklmnopqrstuvwxyz", puzzle.comments)
+    full_puzzle.push_checkpoint()
+    assert full_puzzle.search_for_solution()
+    assert full_puzzle.get_decrypted_codeword((3, 22, 24, 15)) == "some"
+    assert full_puzzle.get_decrypted_codeword((21, 15, 13, 11)) == "read"
+    assert full_puzzle.is_solution_valid(full_puzzle.get_codewords_with_candidates())
+    assert len(full_puzzle.checkpoints) == 1
+    full_puzzle.rollback()
+    assert not any(full_puzzle.substitution_dict.values())
+
+
+def test_search_for_solution_keeps_redo_if_nothing_changes(puzzle):
+    puzzle.push_checkpoint()
+    puzzle.add_to_substitution_dict(3, "c")
+    puzzle.rollback()
+    # no letters left for the numbers in the alphabet of the puzzle, so the search changes nothing
+    puzzle.push_checkpoint()
+    assert not puzzle.search_for_solution()
+    assert puzzle.redo() is not None
+    assert puzzle.substitution_dict[3] == "c"
+
+
+def test_search_for_solution_without_checkpoint(puzzle):
+    full_puzzle = krypto.CodewordPuzzle(puzzle.codewords, puzzle.wordlist, "abcdefghijklmnopqrstuvwxyz", puzzle.comments)
+    for _ in range(3):
+        full_puzzle.clear_substitution_dict()
+        assert full_puzzle.search_for_solution()
+        assert full_puzzle.trail == []
+        assert full_puzzle.checkpoints == []
+    assert full_puzzle.get_decrypted_codeword((3, 22, 24, 15)) == "some"
+
+
+def test_search_for_solution_fails(puzzle):
+    # no letters left for these numbers in the alphabet of the puzzle
+    assert not puzzle.search_for_solution()
+    assert not any(puzzle.substitution_dict.values())
+    assert puzzle.matched_words[(3, 22, 24, 15)] == ["some", "read", "cola", "camp"]
+
+
+def test_prune_letter_domains():
+    assert krypto.prune_letter_domains({1: 0b011, 2: 0b011, 3: 0b111}) == {1: 0b011, 2: 0b011, 3: 0b100}
+    assert krypto.prune_letter_domains({1: 0b001, 2: 0b011, 3: 0b1110}) == {1: 0b001, 2: 0b010, 3: 0b1100}
+    assert krypto.prune_letter_domains({1: 0b001, 2: 0b001}) is None
+
+
+def test_propagate_letter_domains(puzzle):
+    # 15 is the last letter of (3, 22, 24, 15) and the second letter of (21, 15, 13, 11), so it is e or a
+    assert puzzle.propagate_letter_domains()
+    assert puzzle.matched_words[(3, 22, 24, 15)] == ["some", "cola"]
+    assert puzzle.matched_words[(21, 15, 13, 11)] == ["read", "camp"]
+
+
+def test_rematch_words_keeps_letters_different(puzzle):
+    assert puzzle.propagate_letter_domains()
+    assert puzzle.rematch_words()
+    assert puzzle.matched_words[(3, 22, 24, 15)] == ["some", "cola"]
+    puzzle.set_matched_words()
+    assert puzzle.matched_words[(3, 22, 24, 15)] == ["some", "read", "cola", "camp"]
+
+
+def test_try_to_solve_using_unique_pairs_stops_at_contradiction(puzzle, monkeypatch):
+    results_of_propagation = iter([True, False])
+    monkeypatch.setattr(puzzle, "propagate_letter_domains", lambda: next(results_of_propagation))
+    find_all_unique_pairs = puzzle.find_all_unique_pairs
+    calls = []
+    def counting_find_all_unique_pairs():
+        calls.append(1)
+        return find_all_unique_pairs()
+    monkeypatch.setattr(puzzle, "find_all_unique_pairs", counting_find_all_unique_pairs)
+    assert len(list(puzzle.try_to_solve_using_unique_pairs())) == 1
+    assert len(calls) == 1
+
+    monkeypatch.setattr(puzzle, "propagate_letter_domains", lambda: False)
+    assert list(puzzle.try_to_solve_using_unique_pairs()) == []
+    assert len(calls) == 1
+
+
+def test_find_all_unique_pairs_in_parallel(puzzle, monkeypatch):
+    parallel_puzzle = krypto.CodewordPuzzle(puzzle.codewords, puzzle.wordlist, puzzle.alphabet, puzzle.comments, puzzle.wordlist_index, workers=2)
+    monkeypatch.setattr(parallel_puzzle, "MINIMUM_PARALLEL_PAIRS", 1)
+    monkeypatch.setattr(parallel_puzzle, "match_two_codewords", None)
+    assert parallel_puzzle.find_all_unique_pairs() == puzzle.find_all_unique_pairs()
+    assert len(parallel_puzzle.matched_pairs_cache) == 1
+    # the same pool is used again, with the changed candidate lists sent along
+    monkeypatch.setattr(parallel_puzzle, "PAIR_WORKERS_RESTART_SHARE", 1)
+    pair_executor = parallel_puzzle.pair_executor
+    parallel_puzzle.add_to_substitution_dict(3, "c")
+    puzzle.add_to_substitution_dict(3, "c")
+    assert parallel_puzzle.find_all_unique_pairs() == puzzle.find_all_unique_pairs()
+    assert parallel_puzzle.pair_executor is pair_executor
+    parallel_puzzle.close_pair_workers()
+    assert parallel_puzzle.pair_executor is None
+
+
+def test_get_solving_stats(puzzle):
+    puzzle.add_to_substitution_dict(15, "e")
+    assert puzzle.get_solving_stats() == {"solved_codewords": 0, "codewords": 6, "found_words_in_wordlist": 0, "solved_numbers": 1, "numbers": 17}
+
+
+def test_solve_codeword_files(tmp_path, krypto_instance):
+    codeword_path = Path(__file__).parent / "test_stuff" / "test_codewords"
+    output_path = tmp_path / "solved.jsonl"
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        krypto_instance.solve_codeword_files([codeword_path, codeword_path], output_file=output_file)
+    records = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+    assert len(records) == 2
+    assert records[0]["language"] == "en"
+    assert records[0]["words"][4:] == ["some", "read"]
+    assert records[0]["substitution"]["15"] == "e"
+    assert records[0]["stats"]["found_words_in_wordlist"] == 2
+    assert set(records[0]["timings"].keys()) == {"matching", "unique_pairs", "search"}
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="the workers share the index only when forked")
+def test_solve_codeword_files_builds_the_index_once(tmp_path, monkeypatch, krypto_instance):
+    codeword_path = Path(__file__).parent / "test_stuff" / "test_codewords"
+    # the workers are other processes, so the indexes are counted in a file
+    builds_path = tmp_path / "builds"
+    get_wordlist_index = krypto.get_wordlist_index
+    def counting_get_wordlist_index(*args):
+        with open(builds_path, "a", encoding="utf-8") as f:
+            f.write(f"{os.getpid()}\n")
+        return get_wordlist_index(*args)
+    monkeypatch.setattr(krypto, "get_wordlist_index", counting_get_wordlist_index)
+    output_file = io.StringIO()
+    krypto_instance.solve_codeword_files([codeword_path] * 4, jobs=2, output_file=output_file)
+    records = [json.loads(line) for line in output_file.getvalue().splitlines()]
+    assert [record["words"][4:] for record in records] == [["some", "read"]] * 4
+    assert builds_path.read_text(encoding="utf-8").splitlines() == [str(os.getpid())]
+    assert krypto.solve_worker_wordlist_index is None
+
+
+def test_WordlistIndex_build():
+    wordlist_index = krypto.WordlistIndex({4: ["some", "read"], 2: ["to"]}, "abcdefg")
+    wordlist_index.build([4])
+    assert list(wordlist_index.pattern_indices.keys()) == [4]
+    assert list(wordlist_index.position_letter_bitsets.keys()) == [4]
+    wordlist_index.build()
+    assert sorted(wordlist_index.pattern_indices.keys()) == [2, 4]
+
+
+def test_write_codewords(tmp_path):
+    codeword_path = Path(__file__).parent / "test_stuff" / "test_codewords"
+    comments, codewords = krypto.get_codewords(codeword_path)
+    written_path = tmp_path / "written.csv"
+    krypto.write_codewords(written_path, codewords, comments)
+    assert krypto.get_codewords(written_path) == (comments, codewords)
+
+
+def test_Stats():
+    stats = krypto.Stats()
+    with stats.timer("phase"):
+        pass
+    assert stats.timers == {}
+    stats.enable()
+    stats.count("calls")
+    stats.count("calls", 2)
+    with stats.timer("phase"):
+        pass
+    assert stats.counters == {"calls": 3}
+    assert stats.timers["phase"][0] == 1
+    other_stats = krypto.Stats()
+    other_stats.add(stats.get_dict())
+    other_stats.add(stats.get_dict())
+    assert other_stats.counters == {"calls": 6}
+    assert other_stats.timers["phase"][0] == 2
+    assert stats.get_table()[0].split() == ["timer", "calls", "total", "ms", "mean", "us"]
+
+
+def test_stats_of_puzzle(puzzle, monkeypatch):
+    monkeypatch.setattr(krypto, "stats", krypto.Stats())
+    krypto.stats.enable()
+    puzzle.add_to_substitution_dict(15, "e")
+    puzzle.find_all_unique_pairs()
+    assert krypto.stats.counters["update_matched_words calls"] == 1
+    assert krypto.stats.counters["candidates eliminated"] == 6
+    assert krypto.stats.counters["match_two_codewords calls"] == 1
+    assert krypto.stats.timers["find_all_unique_pairs"][0] == 1
+
+
+def test_get_wordlist_with_alphabet_and_lengths():
+    wordlist_path = Path(__file__).parent / "test_stuff" / "test_wordlist"
+    assert krypto.get_wordlist(wordlist_path, "abcdehmorsty", {4, 2}) == ["some", "here", "to", "be", "read", "by", "or"]
+    assert krypto.get_wordlist(wordlist_path, lengths={9}) == ["something"]
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_get_compiled_wordlist_with_lengths(tmp_path, use_cache):
+    wordlist_path = tmp_path / "wordlist.txt"
+    wordlist_path.write_text("some\nwords\nhere\nto\nbook\n", encoding="utf-8")
+    assert krypto.get_compiled_wordlist(wordlist_path, "abcdehmorstwy", use_cache, {4}) == {4: ["some", "here"]}
+    assert krypto.get_compiled_wordlist(wordlist_path, "abcdehmorstwy", use_cache) == {4: ["some", "here"], 5: ["words"], 2: ["to"]}
+
+
+def test_get_wordlist_sorted_by_frequency(tmp_path):
+    wordlist_path = tmp_path / "wordlist.txt"
+    wordlist_path.write_text("some\t5\nhere\t\nread\t30\ncamp\t30\nto\t2\nby\t7\n", encoding="utf-8")
+    assert krypto.get_wordlist(wordlist_path, frequency_column=2) == ["read", "camp", "by", "some", "to", "here"]
+    assert krypto.get_wordlist(wordlist_path, frequency_column=2, frequency_is_rank=True) == ["to", "some", "by", "read", "camp", "here"]
+    assert krypto.get_compiled_wordlist(wordlist_path, frequency_column=2) == {4: ["read", "camp", "some", "here"], 2: ["by", "to"]}
+    # the cache is not used for another frequency setting
+    assert krypto.get_compiled_wordlist(wordlist_path) == {4: ["some", "here", "read", "camp"], 2: ["to", "by"]}
+
+
+def test_WordTrie():
+    wordlists = {4: ["some", "read", "cola", "camp", "read"], 2: ["to", "be", "by"]}
+    word_trie = krypto.WordTrie(wordlists)
+    assert len(word_trie) == 7
+    # the word ids stay in the order of the buckets, without the repeated words
+    assert list(word_trie.wordlists[4]) == ["some", "read", "cola", "camp"]
+    assert word_trie.wordlists[4][2] == "cola"
+    assert word_trie.wordlists[2][:] == ["to", "be", "by"]
+    # the endings "e" and "y" of "be" and "by" share a node with the last letters of "some" and "read"
+    assert len(word_trie.word_counts) < 1 + sum(len(word) for words in wordlists.values() for word in set(words))
+    assert word_trie.get_word_ids((1, 2, 3, 4)) == [0, 1, 2, 3]
+    assert word_trie.get_word_ids((1, 2, 3, 4), {1: "c"}, ["c"]) == [2, 3]
+    assert word_trie.get_word_ids((1, 2, 3, 4), {4: "e"}, ["e", "m"]) == []
+    assert word_trie.get_word_ids((1, 2, 3, 4), {4: "e"}, ["e", "a"]) == [0]
+    assert word_trie.get_word_ids((1, 2, 1, 2)) == []
+
+
+def test_WordTrie_in_alphabetical_order():
+    word_trie = krypto.WordTrie({4: ["camp", "cola", "read", "some"]})
+    assert word_trie.ids_in_trie == dict()
+    assert list(word_trie.wordlists[4]) == ["camp", "cola", "read", "some"]
+    assert word_trie.get_word_ids((1, 2, 3, 4), {1: "c"}, ["c"]) == [0, 1]
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_WordTrie_from_iterate_compiled_wordlist(tmp_path, use_cache):
+    wordlist_path = tmp_path / "wordlist"
+    wordlist_path.write_text("some\t1\nread\t2\ncola\t3\nto\t4\nbe\t5\ncamp\t6\n", encoding="utf-8")
+    length_buckets = krypto.iterate_compiled_wordlist(wordlist_path, "abcdefghijklmnopqrstuvwxyz", use_cache, {4}, 1)
+    word_trie = krypto.WordTrie(length_buckets)
+    assert list(word_trie.wordlists.keys()) == [4]
+    assert list(word_trie.wordlists[4]) == ["some", "read", "cola", "camp"]
+    assert [word_trie.wordlists[4][word_id] for word_id in range(4)] == ["some", "read", "cola", "camp"]
+    assert word_trie.get_word_ids((1, 2, 3, 4), {1: "c"}, ["c"]) == [2, 3]
+    assert list(krypto.WordTrie(krypto.iterate_compiled_wordlist(wordlist_path, "abcdefghijklmnopqrstuvwxyz", use_cache)).wordlists[2]) == ["to", "be"]
+
+
+@pytest.mark.parametrize("wordlists", [
+    {4: ["some", "read", "cola", "camp"], 2: ["to", "be", "by"]},
+    {4: ["camp", "cola", "read", "some"], 2: ["be", "by", "to"]},
+    {9: ["something", "somewhere"] + [f"aaaaaaa{a}{b}" for a in "bcdefghij" for b in "bcdefghij"]}
+])
+def test_WordlistIndex_with_WordTrie_builds_the_same_bitsets(wordlists):
+    wordlist_index = krypto.WordlistIndex(wordlists, "abcdefghijklmnopqrstuvwxyz")
+    trie_index = krypto.WordlistIndex(krypto.WordTrie(wordlists), "abcdefghijklmnopqrstuvwxyz")
+    for length in wordlists:
+        assert trie_index.get_position_letter_bitsets(length) == wordlist_index.get_position_letter_bitsets(length)
+        assert trie_index.get_letter_masks(length) == wordlist_index.get_letter_masks(length)
+
+
+def test_CodewordPuzzle_with_WordTrie(puzzle):
+    wordlist_index = krypto.WordlistIndex(krypto.WordTrie(puzzle.wordlists), puzzle.alphabet)
+    trie_puzzle = krypto.CodewordPuzzle(puzzle.codewords, None, puzzle.alphabet, puzzle.comments, wordlist_index)
+    assert trie_puzzle.matched_words_all == puzzle.matched_words_all
+    trie_puzzle.add_to_substitution_dict(3, "c")
+    trie_puzzle.set_matched_words()
+    assert trie_puzzle.matched_words[(3, 22, 24, 15)] == ["cola", "camp"]
+    assert trie_puzzle.matched_words[(21, 15, 13, 11)] == ["some", "read"]
+
+
+def test_get_codewords_from_lines():
+    comments, codewords = krypto.get_codewords_from_lines(["# comment", "1, 2, 3", "", "4,5,,"])
+    assert comments == ["comment"]
+    assert codewords == [(1, 2, 3), (4, 5)]
+
+
+def test_KryptoServer(krypto_instance):
+    package_path = Path(__file__).parent
+    server = krypto.KryptoServer(("127.0.0.1", 0), krypto_instance, ["en"])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    def post(path, body, content_type):
+        request = urllib.request.Request(url + path, body.encode("utf-8"), {"Content-Type": content_type})
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    try:
+        with urllib.request.urlopen(url + "/languages") as response:
+            assert json.loads(response.read()) == {"languages": ["en"]}
+        codewords_text = (package_path / "test_stuff" / "test_codewords").read_text(encoding="utf-8")
+        response = post("/solve", json.dumps({"codewords": krypto.get_codewords_from_lines(codewords_text.splitlines())[1]}), "application/json")
+        assert response["language"] == "en"
+        assert response["words"][4:] == ["some", "read"]
+        assert response["time"] >= 0
+        response = post("/solve?substitution=3:S", codewords_text, "text/csv")
+        assert response["substitution"]["3"] == "s"
+        assert response["words"][4:] == ["some", "read"]
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post("/solve?substitution=999:a", codewords_text, "text/csv")
+        assert error.value.code == 400
+        response = post("/matches?substitution=3:c", codewords_text, "text/csv")
+        assert response["matches"][4]["codeword"] == [3, 22, 24, 15]
+        assert sorted(response["matches"][4]["words"]) == ["camp", "cola"]
+        response = post("/unique_pairs", codewords_text, "text/csv")
+        assert {"codewords": [[3, 22, 24, 15], [21, 15, 13, 11]], "words": ["some", "read"]} in response["unique_pairs"]
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post("/solve?language=fi", codewords_text, "text/csv")
+        assert error.value.code == 400
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post("/unknown", codewords_text, "text/csv")
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_KryptoSession(krypto_instance):
+    package_path = Path(__file__).parent
+    session = krypto.KryptoSession(krypto_instance)
+    assert session.handle_line('{"command": "progress"}')["ok"] is False
+    commands = [
+        {"command": "load", "path": str(package_path / "test_stuff" / "test_codewords")},
+        {"command": "set_letter", "num": 3, "char": "c", "id": 1},
+        {"command": "matches", "codeword": 5},
+        {"command": "set_word", "codeword": [21, 15, 13, 11], "word": "READ"},
+        {"command": "undo"},
+        {"command": "set_letter", "num": 999, "char": "c"},
+        {"command": "solve"},
+        {"command": "progress"},
+        {"command": "unknown"},
+        {"command": "set_letter", "num": 3, "char": 5},
+        {"command": "set_word", "codeword": 5, "word": 5}
+    ]
+    output_file = io.StringIO()
+    session.run(io.StringIO("\n".join(json.dumps(command) for command in commands) + "\n\n"), output_file)
+    responses = [json.loads(line) for line in output_file.getvalue().splitlines()]
+    assert len(responses) == len(commands)
+    assert [response["ok"] for response in responses] == [True, True, True, True, True, False, True, True, False, False, False]
+    assert all(response["time"] >= 0 for response in responses if response["ok"])
+    assert responses[1]["id"] == 1
+    assert responses[1]["substitution"] == {"3": "c"}
+    assert responses[2]["matches"][0]["codeword"] == [3, 22, 24, 15]
+    assert sorted(responses[2]["matches"][0]["words"]) == ["camp", "cola"]
+    assert responses[3]["in_wordlist"] is True
+    assert responses[4]["changed"] is True
+    assert responses[4]["substitution"] == {"3": "c"}
+    assert "invalid number" in responses[5]["error"]
+    assert responses[7]["codewords"][4]["word"].startswith("c")
+    assert responses[7]["stats"]["codewords"] == 6
+    assert responses[9]["error"].startswith("ValueError")
+    assert responses[10]["error"].startswith("ValueError")
+
+
+def test_KryptoSession_shows_the_current_candidates(monkeypatch, krypto_instance):
+    package_path = Path(__file__).parent
+    session = krypto.KryptoSession(krypto_instance)
+    assert session.handle_line(json.dumps({"command": "load", "path": str(package_path / "test_stuff" / "test_codewords")}))["ok"]
+    assert session.handle_line('{"command": "solve", "method": "propagation"}')["ok"]
+
+    def fail_to_match(*args):
+        raise AssertionError("the candidates should not be matched again")
+    monkeypatch.setattr(krypto_instance.puzzle, "set_matched_words", fail_to_match)
+    matched_words = dict(krypto_instance.puzzle.matched_words)
+    assert session.handle_line('{"command": "matches"}')["ok"]
+    assert session.handle_line('{"command": "progress"}')["ok"]
+    assert krypto_instance.puzzle.matched_words == matched_words
+
+
+def test_KryptoSession_set_letter_checks_before_checkpoint(krypto_instance):
+    package_path = Path(__file__).parent
+    session = krypto.KryptoSession(krypto_instance)
+    assert session.handle_line(json.dumps({"command": "load", "path": str(package_path / "test_stuff" / "test_codewords")}))["ok"]
+    assert session.handle_line('{"command": "set_letter", "num": 3, "char": "C"}')["substitution"] == {3: "c"}
+    number_of_checkpoints = len(krypto_instance.puzzle.checkpoints)
+    for request in ['{"command": "set_letter", "num": 999, "char": "a"}', '{"command": "set_letter", "num": 15, "char": "1"}', '{"command": "set_letter", "num": 15, "char": "c"}']:
+        response = session.handle_line(request)
+        assert response["ok"] is False
+    assert len(krypto_instance.puzzle.checkpoints) == number_of_checkpoints
+    assert "double letter" in response["error"]
+
+
+def test_save_and_resume_session(tmp_path, monkeypatch, krypto_instance):
+    package_path = Path(__file__).parent
+    wordlist_path = krypto_instance.wordlist_path
+    codeword_path = tmp_path / "test_codewords.csv"
+    codeword_path.write_text((package_path / "test_stuff" / "test_codewords").read_text(encoding="utf-8"), encoding="utf-8")
+    krypto_instance.initialize_puzzle(codeword_path, wordlist_path)
+    krypto_instance.puzzle.add_to_substitution_dict(3, "c")
+    session_path = krypto_instance.save_session()
+    assert session_path == tmp_path / "test_codewords.csv.session.json"
+
+    def fail_to_match(*args):
+        raise AssertionError("initial matching should be skipped")
+
+    with monkeypatch.context() as context:
+        context.setattr(krypto.WordlistIndex, "get_matching_words", fail_to_match)
+        context.setattr(krypto.WordlistIndex, "get_bitset_matching_codeword", fail_to_match)
+        resumed_krypto = krypto.Krypto(package_path / "language_file", package_path / "krypto.conf", "fi")
+        assert resumed_krypto.resume_session(session_path)
+    assert resumed_krypto.language == "en"
+    assert resumed_krypto.puzzle.substitution_dict == krypto_instance.puzzle.substitution_dict
+    assert resumed_krypto.puzzle.matched_bitsets_all == krypto_instance.puzzle.matched_bitsets_all
+    assert resumed_krypto.puzzle.matched_bitsets == krypto_instance.puzzle.matched_bitsets
+    for codeword in krypto_instance.puzzle.codewords:
+        assert resumed_krypto.puzzle.matched_words.get(codeword, []) == krypto_instance.puzzle.matched_words.get(codeword, [])
+    assert resumed_krypto.puzzle.unsolved_nums_counts == krypto_instance.puzzle.unsolved_nums_counts
+
+    # the words are matched again if the wordlist has changed
+    with open(wordlist_path, "a", encoding="utf-8") as f:
+        f.write("\ncalm\n")
+    resumed_krypto = krypto.Krypto(package_path / "language_file", package_path / "krypto.conf", "en")
+    assert resumed_krypto.resume_session(session_path)
+    assert resumed_krypto.puzzle.substitution_dict[3] == "c"
+    assert "calm" in resumed_krypto.puzzle.matched_words[(3, 22, 24, 15)]
+
+    with open(codeword_path, "a", encoding="utf-8") as f:
+        f.write("1, 2\n")
+    assert not resumed_krypto.resume_session(session_path)
+
+
+def test_resume_session_that_cannot_be_loaded(tmp_path, monkeypatch, capsys, krypto_instance):
+    package_path = Path(__file__).parent
+    wordlist_path = krypto_instance.wordlist_path
+    codeword_path = tmp_path / "test_codewords.csv"
+    codeword_path.write_text((package_path / "test_stuff" / "test_codewords").read_text(encoding="utf-8"), encoding="utf-8")
+    # a relative wordlist path is saved as an absolute one
+    monkeypatch.chdir(tmp_path)
+    krypto_instance.wordlist_path = Path("test_wordlist")
+    krypto_instance.initialize_puzzle(codeword_path, Path("test_wordlist"))
+    session_path = krypto_instance.save_session()
+    session = krypto.read_session(session_path)
+    assert session["wordlist_path"] == str(wordlist_path.resolve())
+    capsys.readouterr()
+
+    resumed_krypto = krypto.Krypto(package_path / "language_file", package_path / "krypto.conf", "en")
+    assert not resumed_krypto.resume_session(tmp_path / "missing.session.json")
+    assert "missing.session.json could not be loaded" in capsys.readouterr().out
+
+    krypto.write_session(session_path, {**session, "version": krypto.SESSION_FORMAT_VERSION + 1})
+    assert not resumed_krypto.resume_session(session_path)
+    assert "could not be loaded" in capsys.readouterr().out
+
+    krypto.write_session(session_path, {**session, "wordlist_path": str(tmp_path / "missing_wordlist")})
+    assert not resumed_krypto.resume_session(session_path)
+    assert "could not be loaded" in capsys.readouterr().out
+    assert resumed_krypto.puzzle is None
@@ -0,0 +1,46 @@
+from pathlib import Path
+import random
+
+import pytest
+
+import krypto
+import puzzle_generator
+
+
+WORDLIST_PATH = Path(__file__).parent / "test_stuff" / "test_wordlist"
+ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+
+
+def test_generate_puzzle():
+    wordlists = krypto.get_compiled_wordlist(WORDLIST_PATH, ALPHABET, use_cache=False)
+    codewords, words, nums_by_char = puzzle_generator.generate_puzzle(wordlists, 4, ALPHABET, seed=1, length_weights={4: 1})
+    assert len(set(words)) == 4
+    assert all(word in wordlists[4] for word in words)
+    assert sorted(nums_by_char.values()) == list(range(1, len(ALPHABET) + 1))
+    assert codewords == [tuple(nums_by_char[char] for char in word) for word in words]
+    assert puzzle_generator.generate_puzzle(wordlists, 4, ALPHABET, seed=1, length_weights={4: 1}) == (codewords, words, nums_by_char)
+
+
+def test_choose_words_with_letter_coverage():
+    wordlists = krypto.get_compiled_wordlist(WORDLIST_PATH, ALPHABET, use_cache=False)
+    words = puzzle_generator.choose_words(random.Random(2), wordlists, 3, None, 0.5, ALPHABET)
+    assert puzzle_generator.get_letter_coverage(words, ALPHABET) >= 0.5
+
+
+def test_choose_words_uses_every_word_of_a_length():
+    # all five 4-letter words are needed, so no word is left to swap in for a better coverage
+    wordlists = krypto.get_compiled_wordlist(WORDLIST_PATH, ALPHABET, use_cache=False)
+    codewords, words, nums_by_char = puzzle_generator.generate_puzzle(wordlists, 5, ALPHABET, seed=1, length_weights={4: 1}, letter_coverage=0.9)
+    assert sorted(words) == sorted(wordlists[4])
+    with pytest.raises(ValueError):
+        puzzle_generator.choose_random_word(random.Random(1), wordlists, [4], [1], words)
+
+
+def test_write_and_read_answers(tmp_path):
+    codeword_path = tmp_path / "puzzle.csv"
+    answer_path = puzzle_generator.get_answer_path(codeword_path)
+    assert answer_path == tmp_path / "puzzle.answers.json"
+    puzzle_generator.write_answers(answer_path, [(1, 2, 3, 4), (5, 4, 6, 7)], ["some", "read"])
+    substitution, words = puzzle_generator.read_answers(answer_path)
+    assert words == ["some", "read"]
+    assert substitution == {1: "s", 2: "o", 3: "m", 4: "e", 5: "r", 6: "a", 7: "d"}